@@ -18,18 +18,37 @@ def create_ai_strat(colors):
     colors = set(colors)
 
     def _strat(game_state):
-        moves_with_matches = find_moves(game_state.board)
-        moves_with_match = list(_explode_moves(moves_with_matches))
-        moves_with_match = _select_longest_straight(moves_with_match)
-        moves_with_match = _select_preferred_colors(moves_with_match,
-                                                    colors,
-                                                    game_state.board)
+        moves_with_match = ai_moves(game_state.board, colors)
+        if not moves_with_match:
+            return None
         move_with_match = random.choice(moves_with_match)
         return (move_with_match[0], move_with_match[1])
 
     return _strat
 
 
+def ai_moves(board, colors):
+    """
+    Return the list of (from_sq, to_sq, match) the AI, with abilities in
+    `colors`, picks its move from at random: one for each direction of each
+    move, for each of its matches the AI would take.
+
+    Since the AI picks uniformly from the list, a move appearing in it more
+    than once is that much more likely to be picked.
+
+    `board` may have empty squares (e.g. a settled board, waiting for its
+    refill, when modelling a reply): swaps with them aren't moves.
+    """
+    moves_with_match = list(_explode_moves(
+        mwm for mwm in find_moves(board)
+        if not (board.at(*mwm.from_sq).is_empty() or
+                board.at(*mwm.to_sq).is_empty())))
+    if not moves_with_match:
+        return []
+    moves_with_match = _select_longest_straight(moves_with_match)
+    return _select_preferred_colors(moves_with_match, set(colors), board)
+
+
 def _explode_moves(moves_with_matches):
     for from_sq, to_sq, matches in moves_with_matches:
         for match in matches:
@@ -38,10 +57,7 @@ def _explode_moves(moves_with_matches):
 
 def _longest_extent(move_with_match):
     from_sq, to_sq, match = move_with_match
-    extents = match.max_extents
-    col_extents = extents['cols'].values()
-    row_extents = extents['rows'].values()
-    return max(col_extents + row_extents)
+    return match.longest_extent
 
 
 def _select_longest_straight(moves_with_match):
@@ -0,0 +1,35 @@
+"""
+Anytime strategies: ones that can be given a deadline.
+
+A strategy is a callable(GameState).  One marked with `anytime` may also be
+passed a `deadline` (a time.time() value), in which case it should work
+on a best-so-far move, starting from a cheap guess, and return it once the
+deadline passes.  Strategies that aren't marked are never passed one.
+"""
+
+import time
+
+
+def anytime(strategy):
+    """
+    Mark `strategy` as taking a `deadline`, and return it.
+    """
+    strategy.takes_deadline = True
+    return strategy
+
+
+def takes_deadline(strategy):
+    return getattr(strategy, 'takes_deadline', False)
+
+
+def until(deadline, items):
+    """
+    Generate `items` until `deadline` passes, or all of them if `deadline`
+    is None.
+
+    The first item is always generated, so there's something to go on.
+    """
+    for num, item in enumerate(items):
+        if num and deadline is not None and time.time() >= deadline:
+            return
+        yield item
@@ -0,0 +1,360 @@
+"""
+Bitboard match detection.
+
+Each tile class (a color, or teamups) gets an integer mask with one bit per
+square.  Criticals are set in every class's mask, since they match any game
+tile.  Windows of MIN_MATCH matching tiles are then found by ANDing shifted
+copies of each mask, with no per-square method calls.
+
+Every mask is built twice: once row by row, and once column by column
+(transposed), so that both directions can be handled as runs of bits along a
+line.
+
+Legal swaps on a stable board are found the same way, by matching templates
+against the masks (see find_swaps), without swapping anything.
+"""
+
+from constants import MIN_MATCH
+from tiles import COLORS, code_kind, KIND_EMPTY, KIND_NULL, \
+    KIND_CRITICAL, KIND_TEAMUP, KIND_OTHER, COLOR_MASK
+
+
+NUM_CLASSES = len(COLORS) + 1
+
+TEAMUP_CLASS = len(COLORS)
+CRITICAL_CLASS = -1
+BLOCKER_CLASS = -2
+UNKNOWN_CLASS = -3
+
+
+def class_of(code):
+    """
+    Return the class (index into the masks) of tiles with `code`, or one of
+    CRITICAL_CLASS, BLOCKER_CLASS (tiles that never match) or UNKNOWN_CLASS.
+    """
+    kind = code_kind(code)
+    if kind in (KIND_EMPTY, KIND_NULL):
+        return BLOCKER_CLASS
+    elif kind == KIND_CRITICAL:
+        return CRITICAL_CLASS
+    elif kind == KIND_TEAMUP:
+        return TEAMUP_CLASS
+    elif kind >= KIND_OTHER:
+        return UNKNOWN_CLASS
+    return (code & COLOR_MASK) - 1
+
+
+CLASS_BY_CODE = [class_of(code) for code in range(256)]
+
+
+class _Layout(object):
+    """
+    Precomputed bits for boards of one side.
+    """
+
+    def __init__(self, side):
+        self.side = side
+        # bit for square index i, row major and transposed
+        self.row_bits = [1 << i for i in range(side * side)]
+        self.col_bits = [1 << ((i % side) * side + i / side)
+                         for i in range(side * side)]
+        # bits at which a full window can start within its line
+        self.window_starts = 0
+        for line in range(side):
+            for pos in range(side - MIN_MATCH + 1):
+                self.window_starts |= 1 << (line * side + pos)
+        self.line_masks = [((1 << side) - 1) << (line * side)
+                           for line in range(side)]
+        # bits of the first and last squares of every line
+        self.line_firsts = 0
+        self.line_lasts = 0
+        for line in range(side):
+            self.line_firsts |= 1 << (line * side)
+            self.line_lasts |= 1 << (line * side + side - 1)
+        # square indices in each row and col
+        self.row_squares = [range(row * side, (row + 1) * side)
+                            for row in range(side)]
+        self.col_squares = [range(col, side * side, side)
+                            for col in range(side)]
+
+
+_LAYOUTS = dict()
+
+
+def _layout(side):
+    if side not in _LAYOUTS:
+        _LAYOUTS[side] = _Layout(side)
+    return _LAYOUTS[side]
+
+
+def class_masks(board):
+    """
+    Return (row_masks, col_masks), each a list of NUM_CLASSES masks, with
+    criticals included in every mask.
+
+    Returns None if the board holds tiles this module can't classify.
+    """
+    layout = _layout(board.side)
+    row_bits = layout.row_bits
+    col_bits = layout.col_bits
+    row_masks = [0] * NUM_CLASSES
+    col_masks = [0] * NUM_CLASSES
+    row_crits = col_crits = 0
+    i = 0
+    for code in board.codes:
+        cls = CLASS_BY_CODE[code]
+        if cls >= 0:
+            row_masks[cls] |= row_bits[i]
+            col_masks[cls] |= col_bits[i]
+        elif cls == CRITICAL_CLASS:
+            row_crits |= row_bits[i]
+            col_crits |= col_bits[i]
+        elif cls == UNKNOWN_CLASS:
+            return None
+        i += 1
+    if row_crits:
+        row_masks = [m | row_crits for m in row_masks]
+        col_masks = [m | col_crits for m in col_masks]
+    return row_masks, col_masks
+
+
+def _line_class_masks(codes, lines, line_squares, bits):
+    """
+    Like class_masks, for only one direction, and only the squares in
+    `lines`.
+    """
+    masks = [0] * NUM_CLASSES
+    crits = 0
+    for line in lines:
+        for i in line_squares[line]:
+            cls = CLASS_BY_CODE[codes[i]]
+            if cls >= 0:
+                masks[cls] |= bits[i]
+            elif cls == CRITICAL_CLASS:
+                crits |= bits[i]
+            elif cls == UNKNOWN_CLASS:
+                return None
+    if crits:
+        masks = [m | crits for m in masks]
+    return masks
+
+
+def _windows(mask, layout):
+    """
+    Return the bits at which MIN_MATCH bits of `mask` in a row start.
+    """
+    windows = mask & layout.window_starts
+    for shift in range(1, MIN_MATCH):
+        windows &= mask >> shift
+    return windows
+
+
+def _covered(windows):
+    covered = windows
+    for shift in range(1, MIN_MATCH):
+        covered |= windows << shift
+    return covered
+
+
+def _segments(covered, side):
+    """
+    Generate (line, first, last) for every run of set bits in `covered`,
+    split at line boundaries.
+    """
+    while covered:
+        low = covered & -covered
+        bit = low.bit_length() - 1
+        line, first = divmod(bit, side)
+        ones = covered >> bit
+        length = min((~ones & (ones + 1)).bit_length() - 1, side - first)
+        covered &= ~(((1 << length) - 1) << bit)
+        yield line, first, first + length - 1
+
+
+def _line_spans(masks, layout, lines_mask=None):
+    """
+    Return a dict of line -> (ends, starts), where `ends` maps each position
+    to the furthest position a match starting there reaches, and `starts`
+    maps each position to the earliest position a match ending there starts
+    from.
+
+    These are the greedy runs you'd get walking each way from each square:
+    a run can be extended as long as all its tiles fall in a single class's
+    mask.
+    """
+    spans = dict()
+    for mask in masks:
+        windows = _windows(mask, layout)
+        if lines_mask is not None:
+            windows &= lines_mask
+        if not windows:
+            continue
+        for line, first, last in _segments(_covered(windows), layout.side):
+            if line not in spans:
+                spans[line] = (dict(), dict())
+            ends, starts = spans[line]
+            for pos in range(first, last - MIN_MATCH + 2):
+                if ends.get(pos, -1) < last:
+                    ends[pos] = last
+            for pos in range(first + MIN_MATCH - 1, last + 1):
+                if starts.get(pos, layout.side) > first:
+                    starts[pos] = first
+    return spans
+
+
+def find_runs(board):
+    """
+    Return a set of runs, each a tuple of (row, col) squares, that greedily
+    walking left, right, up, and down from every square would find.
+
+    Returns None if the board can't be checked with bitboards.
+    """
+    masks = class_masks(board)
+    if masks is None:
+        return None
+    row_masks, col_masks = masks
+    return _runs(row_masks, col_masks, _layout(board.side))
+
+
+def find_runs_through(board, squares):
+    """
+    Same as find_runs, but only for the rows and cols through `squares`.
+    """
+    layout = _layout(board.side)
+    row_masks = _line_class_masks(board.codes,
+                                  set(row for row, _ in squares),
+                                  layout.row_squares,
+                                  layout.row_bits)
+    col_masks = _line_class_masks(board.codes,
+                                  set(col for _, col in squares),
+                                  layout.col_squares,
+                                  layout.col_bits)
+    if row_masks is None or col_masks is None:
+        return None
+    return _runs(row_masks, col_masks, layout)
+
+
+def _runs(row_masks, col_masks, layout):
+    runs = set()
+    for line, (ends, starts) in _line_spans(row_masks, layout).items():
+        for first, last in _pairs(ends, starts):
+            runs.add(tuple((line, col) for col in range(first, last + 1)))
+    for line, (ends, starts) in _line_spans(col_masks, layout).items():
+        for first, last in _pairs(ends, starts):
+            runs.add(tuple((row, line) for row in range(first, last + 1)))
+    return runs
+
+
+def _pairs(ends, starts):
+    pairs = set(ends.items())
+    pairs.update((first, last) for (last, first) in starts.items())
+    return pairs
+
+
+def find_runs_at(row, col, board):
+    """
+    Return the runs starting at (row, col) and walking left, right, up, and
+    down, as a list of tuples of (row, col) squares.
+
+    Returns None if the board can't be checked with bitboards.
+    """
+    masks = class_masks(board)
+    if masks is None:
+        return None
+    row_masks, col_masks = masks
+    layout = _layout(board.side)
+    runs = []
+
+    spans = _line_spans(row_masks, layout, layout.line_masks[row])
+    if row in spans:
+        ends, starts = spans[row]
+        if col in ends:
+            runs.append(tuple((row, c) for c in range(col, ends[col] + 1)))
+        if col in starts:
+            runs.append(tuple((row, c) for c in range(starts[col], col + 1)))
+
+    spans = _line_spans(col_masks, layout, layout.line_masks[col])
+    if col in spans:
+        ends, starts = spans[col]
+        if row in ends:
+            runs.append(tuple((r, col) for r in range(row, ends[row] + 1)))
+        if row in starts:
+            runs.append(tuple((r, col) for r in range(starts[row], row + 1)))
+
+    return runs
+
+
+def _gap_swaps(mask, layout):
+    """
+    Generate (gaps, offset) pairs, where `gaps` holds the bits of squares
+    that would complete a window along a line of `mask` with the tile
+    `offset` bits away, which lies outside the window.
+    """
+    side = layout.side
+    for gap in range(MIN_MATCH):
+        starts = layout.window_starts
+        for pos in range(MIN_MATCH):
+            if pos != gap:
+                starts &= mask >> pos
+        if not starts:
+            continue
+        gaps = starts << gap
+        # from the neighboring lines
+        yield gaps & (mask >> side), side
+        yield gaps & (mask << side), -side
+        # from along the line, past either end of the window
+        if gap == 0:
+            yield gaps & (mask << 1) & ~layout.line_firsts, -1
+        if gap == MIN_MATCH - 1:
+            yield gaps & (mask >> 1) & ~layout.line_lasts, 1
+
+
+def find_swaps(board):
+    """
+    Return the set of ((row, col), (row, col)) swaps, smaller square first,
+    that make a match on `board`, which must be stable.
+
+    On a stable board, a swap makes a match only by moving a tile into the
+    gap of a window whose other squares already match it, from a square
+    outside the window: the `XX_X` and `X_XX` shapes along a line, and the
+    tiles either side of the gap in `X_X` or at the end of `XX_`.  (Swapping
+    two squares of one window just reorders it.)
+
+    Returns None if the board can't be checked with bitboards.
+    """
+    masks = class_masks(board)
+    if masks is None:
+        return None
+    side = board.side
+    layout = _layout(side)
+    swaps = set()
+    for line_masks, transposed in zip(masks, [False, True]):
+        for mask in line_masks:
+            for gaps, offset in _gap_swaps(mask, layout):
+                while gaps:
+                    low = gaps & -gaps
+                    bit = low.bit_length() - 1
+                    squares = [divmod(bit, side), divmod(bit + offset, side)]
+                    if transposed:
+                        squares = [(col, row) for row, col in squares]
+                    swaps.add(tuple(sorted(squares)))
+                    gaps ^= low
+    return swaps
+
+
+def has_swap(board):
+    """
+    Return whether any swap makes a match on `board`, which must be stable.
+
+    Returns None if the board can't be checked with bitboards.
+    """
+    masks = class_masks(board)
+    if masks is None:
+        return None
+    layout = _layout(board.side)
+    for line_masks in masks:
+        for mask in line_masks:
+            for gaps, _ in _gap_swaps(mask, layout):
+                if gaps:
+                    return True
+    return False
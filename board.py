@@ -3,6 +3,8 @@ Code for dealing with the board.
 """
 
 import hashutils
+from hashutils import MASK_64, zobrist_table
+from tiles import tile_code, PLAIN_TILES
 
 
 def _format_row(row):
@@ -10,10 +12,36 @@ def _format_row(row):
 
 
 class Board(object):
+    """
+    A square board of tiles.
+
+    Squares are stored flat, row by row, one byte per square in `codes` (see
+    tiles.tile_code).  Tiles that can't be rebuilt from their code alone
+    (protect tiles, countdowns, etc.) are also kept in `specials`, keyed by
+    square index, so copying, swapping and comparing boards mostly come down
+    to operations on `codes`.
+
+    A 64 bit Zobrist hash of the board (see `hash`) is kept up to date by
+    `set_at` and `swap`.  Tiles changed in place, rather than replaced with
+    `set_at`, won't be reflected in it.
+
+    Changes can be made provisionally: `checkpoint` starts logging `set_at`
+    and `swap` calls, `rollback` undoes them from the log, and `commit`
+    stops logging.  Checkpoints nest.
+    """
 
     def __init__(self, rows):
         assert all(len(rows) == len(row) for row in rows)
-        self.rows = rows
+        self._side = len(rows)
+        self.codes = bytearray(self._side * self._side)
+        self.specials = dict()
+        self._zobrist = zobrist_table(self._side * self._side)
+        self._hash = 0
+        self._undo = []
+        self._depth = 0
+        for row, tiles in enumerate(rows):
+            for col, tile in enumerate(tiles):
+                self.set_at(row, col, tile)
 
     def __str__(self):
         # TODO: find longest tile and pad to that instead of 3
@@ -24,10 +52,25 @@ class Board(object):
             yield self.at(row, col)
 
     def __eq__(self, other):
-        return isinstance(other, Board) and self.rows == other.rows
+        return (isinstance(other, Board) and
+                self.codes == other.codes and
+                self.specials == other.specials)
+
+    def __ne__(self, other):
+        return not self == other
 
     def hash(self):
-        return hash(tuple([tuple(r) for r in self.rows]))
+        """
+        Return a 64 bit hash of the tiles on the board.
+
+        Cheap: it's maintained incrementally as tiles are set and swapped.
+        """
+        return self._hash
+
+    @property
+    def rows(self):
+        return [[self.at(row, col) for col in range(self._side)]
+                for row in range(self._side)]
 
     def at(self, row, col):
         """
@@ -35,33 +78,138 @@ class Board(object):
 
         Raise an exception if out of bounds.
         """
-        if len(self.rows) <= row:
+        if self._side <= row:
             raise Exception("Bad row num: %s" % row)
 
-        if len(self.rows[0]) <= col:
+        if self._side <= col:
             raise Exception("Bad col num: %s" % col)
 
-        return self.rows[row][col]
+        i = row * self._side + col
+        tile = PLAIN_TILES[self.codes[i]]
+        if tile is None:
+            tile = self.specials[i]
+        return tile
 
     def is_in_bounds(self, row, col):
         return all(0 <= n < self.side for n in [row, col])
 
     def set_at(self, row, col, tile):
-        self.rows[row][col] = tile
+        if self._depth:
+            self._undo.append((row, col, self.at(row, col)))
+        i = row * self._side + col
+        code = tile_code(tile)
+        zobrist = self._zobrist
+        h = self._hash ^ zobrist[(i << 8) | self.codes[i]]
+        if i in self.specials:
+            h ^= _special_key(i, self.specials.pop(i))
+        self.codes[i] = code
+        h ^= zobrist[(i << 8) | code]
+        if PLAIN_TILES[code] is None:
+            self.specials[i] = tile
+            h ^= _special_key(i, tile)
+        self._hash = h
 
     def copy(self):
-        return Board([[t.copy() for t in row] for row in self.rows])
+        board = Board.__new__(Board)
+        board._side = self._side
+        board.codes = self.codes[:]
+        board._zobrist = self._zobrist
+        board._hash = self._hash
+        board._undo = []
+        board._depth = 0
+        board.specials = dict((i, t.copy())
+                              for i, t in self.specials.iteritems())
+        return board
+
+    @classmethod
+    def from_codes(cls, side, codes, specials):
+        """
+        Build a board straight from `codes` (one per square, row by row) and
+        `specials` (square index -> tile, for every code that needs one).
+        """
+        board = cls.__new__(cls)
+        board._side = side
+        board.codes = bytearray(codes)
+        board.specials = dict(specials)
+        board._zobrist = zobrist_table(side * side)
+        board._undo = []
+        board._depth = 0
+        h = 0
+        for i, code in enumerate(board.codes):
+            h ^= board._zobrist[(i << 8) | code]
+        for i, tile in board.specials.items():
+            h ^= _special_key(i, tile)
+        board._hash = h
+        return board
 
     @property
     def side(self):
-        return len(self.rows)
+        return self._side
 
     def swap(self, row_one, col_one, row_two, col_two):
         """
         Swap the tiles at (row_one, col_one) and (row_two, col_two).
         """
-        self.rows[row_one][col_one], self.rows[row_two][col_two] = \
-            self.rows[row_two][col_two], self.rows[row_one][col_one]
+        if self._depth:
+            self._undo.append((row_one, col_one, row_two, col_two))
+        i = row_one * self._side + col_one
+        j = row_two * self._side + col_two
+        codes = self.codes
+        code_i, code_j = codes[i], codes[j]
+        codes[i], codes[j] = code_j, code_i
+
+        zobrist = self._zobrist
+        key_i, key_j = i << 8, j << 8
+        self._hash ^= (zobrist[key_i | code_i] ^ zobrist[key_j | code_j] ^
+                       zobrist[key_i | code_j] ^ zobrist[key_j | code_i])
+
+        specials = self.specials
+        if i in specials or j in specials:
+            has_i, has_j = i in specials, j in specials
+            tile_i, tile_j = specials.pop(i, None), specials.pop(j, None)
+            h = self._hash
+            if has_i:
+                specials[j] = tile_i
+                h ^= _special_key(i, tile_i) ^ _special_key(j, tile_i)
+            if has_j:
+                specials[i] = tile_j
+                h ^= _special_key(j, tile_j) ^ _special_key(i, tile_j)
+            self._hash = h
+
+    def checkpoint(self):
+        """
+        Start logging changes to the board, if not already, and return a
+        mark that `rollback` can return the board to.
+
+        Each checkpoint must be matched by a `commit`.
+        """
+        self._depth += 1
+        return len(self._undo)
+
+    def rollback(self, mark):
+        """
+        Undo all changes logged since `checkpoint` returned `mark`.
+        """
+        undo = self._undo
+        depth, self._depth = self._depth, 0
+        while len(undo) > mark:
+            change = undo.pop()
+            if len(change) == 4:
+                self.swap(*change)
+            else:
+                self.set_at(*change)
+        self._depth = depth
+
+    def commit(self):
+        """
+        Close the latest checkpoint, keeping its changes.
+
+        Once the outermost checkpoint is closed, the log is dropped and
+        changes are no longer logged.
+        """
+        self._depth -= 1
+        if not self._depth:
+            self._undo = []
 
     def squares_from_bottom_right(self):
         """
@@ -76,6 +224,11 @@ class Board(object):
                 yield row, col
 
     def md5(self):
+        """
+        Return the md5 of the rendered board.
+
+        Slow, and only meant for human-facing output--use `hash` for keying.
+        """
         return hashutils.md5(str(self))
 
     def as_fancy_str(self):
@@ -90,7 +243,15 @@ class Board(object):
         return '\n'.join(lines)
 
     def protection(self, direction):
-        return sum(sq.protection(direction) for sq in self)
+        # plain tiles never carry protection
+        return sum(t.protection(direction) for t in self.specials.values())
+
+
+def _special_key(i, tile):
+    """
+    Zobrist key for the state a special tile carries beyond its code.
+    """
+    return hash((i, str(tile))) & MASK_64
 
 
 def neighbors(row, col, side):
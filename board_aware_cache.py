@@ -1,24 +1,200 @@
 """
 Cache expensive, board-dependent operations.
+
+Each operation (e.g. 'find_matches') gets its own namespace: a bounded cache
+with its own budget and its own hit / miss / eviction counters.  Entries are
+keyed by the board's incrementally maintained hash (see board.Board.hash), so
+a lookup doesn't need to render the board.
+
+Empty results are cached like any other: callers should treat only None as a
+miss.
 """
 
-CACHE = dict()
+import atexit
+from collections import OrderedDict
+import sys
+
+
+LRU = 'lru'
+FIFO = 'fifo'
+
+DEFAULT_MAX_ENTRIES = 50000
+
+
+def approx_size(val):
+    """
+    Rough size in bytes of `val` and (one level deep) its items.
+    """
+    size = sys.getsizeof(val)
+    if isinstance(val, (list, tuple)):
+        size += sum(sys.getsizeof(v) for v in val)
+    return size
+
+
+class BoundedCache(object):
+    """
+    A cache holding at most `max_entries` entries and (if not None) about
+    `max_bytes` bytes, as measured by `sizer`.
+
+    When over budget, the least recently used entry (`policy` LRU) or the
+    oldest entry (`policy` FIFO) is evicted.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=None,
+                 policy=LRU, sizer=approx_size):
+        if policy not in (LRU, FIFO):
+            raise Exception("Bad cache policy: %s" % policy)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.policy = policy
+        self.sizer = sizer
+        self.entries = OrderedDict()
+        self.num_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        """
+        Return the value cached for `key`, or None if there isn't one.
+        """
+        entries = self.entries
+        if key not in entries:
+            self.misses += 1
+            return None
+        self.hits += 1
+        if self.policy == LRU:
+            entry = entries.pop(key)
+            entries[key] = entry
+        else:
+            entry = entries[key]
+        return entry[0]
+
+    def set(self, key, val):
+        entries = self.entries
+        if key in entries:
+            self.num_bytes -= entries.pop(key)[1]
+        size = 0
+        if self.max_bytes is not None:
+            size = self.sizer(val)
+        entries[key] = (val, size)
+        self.num_bytes += size
+        while entries and self._over_budget():
+            _, (_, size) = entries.popitem(last=False)
+            self.num_bytes -= size
+            self.evictions += 1
+
+    def _over_budget(self):
+        return ((self.max_entries is not None and
+                 len(self.entries) > self.max_entries) or
+                (self.max_bytes is not None and
+                 self.num_bytes > self.max_bytes))
+
+    def clear(self):
+        self.entries = OrderedDict()
+        self.num_bytes = 0
+
+    def stats(self):
+        return dict(hits=self.hits,
+                    misses=self.misses,
+                    evictions=self.evictions,
+                    entries=len(self.entries),
+                    bytes=self.num_bytes)
+
+
+_SETTINGS = dict(max_entries=DEFAULT_MAX_ENTRIES,
+                 max_bytes=None,
+                 policy=LRU)
+
+# operation -> settings overriding _SETTINGS
+_OPERATION_SETTINGS = dict()
+
+# operation -> BoundedCache
+NAMESPACES = dict()
+
+
+def configure(operation=None, max_entries=DEFAULT_MAX_ENTRIES,
+              max_bytes=None, policy=LRU):
+    """
+    Set the budget and eviction policy for `operation`, or (if `operation` is
+    None) the defaults for every operation.
+
+    Drops the entries (and counters) of the affected namespaces.
+    """
+    settings = dict(max_entries=max_entries,
+                    max_bytes=max_bytes,
+                    policy=policy)
+    # fail here rather than on the next lookup
+    BoundedCache(**settings)
+    if operation is None:
+        _SETTINGS.update(settings)
+        _OPERATION_SETTINGS.clear()
+        NAMESPACES.clear()
+    else:
+        _OPERATION_SETTINGS[operation] = settings
+        NAMESPACES.pop(operation, None)
+
+
+def _namespace(operation):
+    if operation not in NAMESPACES:
+        settings = _OPERATION_SETTINGS.get(operation, _SETTINGS)
+        NAMESPACES[operation] = BoundedCache(**settings)
+    return NAMESPACES[operation]
+
+
+def _key(board, extra):
+    return (board.side, board.hash(), extra)
 
 
 def get(operation, board, extra):
-    md5 = board.md5()
-    key = (operation, md5, extra)
-    if key in CACHE:
-        return CACHE[key]
-    return None
+    """
+    Return the value cached for `operation` on `board`, or None on a miss.
+    """
+    return _namespace(operation).get(_key(board, extra))
 
 
 def set(operation, board, extra, val):
-    md5 = board.md5()
-    key = (operation, md5, extra)
-    CACHE[key] = val
+    _namespace(operation).set(_key(board, extra), val)
 
 
 def clear():
-    global CACHE
-    CACHE = dict()
+    """
+    Drop all cached entries (but keep the counters).
+    """
+    for cache in NAMESPACES.values():
+        cache.clear()
+
+
+def reset_stats():
+    for cache in NAMESPACES.values():
+        cache.hits = cache.misses = cache.evictions = 0
+
+
+def stats():
+    """
+    Return a dict of operation -> dict of hits, misses, evictions, entries
+    and bytes.
+    """
+    return dict((operation, cache.stats())
+                for operation, cache
+                in NAMESPACES.items())
+
+
+def dump_stats(out=sys.stderr):
+    for operation, op_stats in sorted(stats().items()):
+        lookups = op_stats['hits'] + op_stats['misses']
+        hit_rate = 0.0
+        if lookups:
+            hit_rate = float(op_stats['hits']) / lookups
+        print >> out, ("%s: hits=%d misses=%d hit_rate=%.3f evictions=%d "
+                       "entries=%d bytes=%d" %
+                       (operation, op_stats['hits'], op_stats['misses'],
+                        hit_rate, op_stats['evictions'], op_stats['entries'],
+                        op_stats['bytes']))
+
+
+def dump_stats_at_exit(out=sys.stderr):
+    atexit.register(dump_stats, out)
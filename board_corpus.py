@@ -0,0 +1,135 @@
+"""
+Pregenerated stable starting boards.
+
+A corpus file is a fixed size header followed by one record per board: the
+board's tile codes (see tiles.tile_code), one byte per square, row by row.
+Stable boards only ever hold plain tiles, so the codes are the whole board,
+and reading one back is a slice of a memory mapped file with no parsing.
+
+Generate a corpus with e.g.:
+
+    python board_corpus.py --count 1000000 --side 8 1234 boards.corpus
+
+and pass it to the simulation scripts with --board-corpus.
+"""
+
+from argparse import ArgumentParser
+import mmap
+import random
+import struct
+
+from board import Board
+from constants import BOARD_SIDE
+from stable_board import rand_stable_board
+
+
+MAGIC = 'HCBC'
+VERSION = 1
+
+# magic, version, side, no_teamups, count, seed
+HEADER = struct.Struct('<4sBBBxQq')
+
+
+def write_corpus(path, seed, count, side=BOARD_SIDE, no_teamups=False):
+    """
+    Write `count` boards from rand_stable_board to a corpus file at `path`.
+
+    The global random generator is seeded with `seed` first, so the same
+    arguments always write the same file.
+    """
+    random.seed(seed)
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, side, int(no_teamups),
+                            count, seed))
+        for _ in range(count):
+            board = rand_stable_board(side, no_teamups=no_teamups)
+            f.write(board.codes)
+
+
+class BoardCorpus(object):
+    """
+    Read access to a corpus file, memory mapped.
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._map) < HEADER.size:
+            raise Exception("Not a board corpus: %s" % path)
+        (magic, version, self.side, no_teamups,
+         self.count, self.seed) = HEADER.unpack(self._map[:HEADER.size])
+        if magic != MAGIC or version != VERSION:
+            raise Exception("Not a board corpus: %s" % path)
+        self.no_teamups = bool(no_teamups)
+        self._record_size = self.side * self.side
+        if len(self._map) != HEADER.size + self.count * self._record_size:
+            raise Exception("Truncated board corpus: %s" % path)
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        return self.board(i)
+
+    def board(self, i):
+        """
+        Return the `i`th board in the corpus as a new Board.
+        """
+        if not 0 <= i < self.count:
+            raise Exception("Bad board num: %s" % i)
+        start = HEADER.size + i * self._record_size
+        return Board.from_codes(self.side,
+                                self._map[start:start + self._record_size],
+                                {})
+
+    def close(self):
+        self._map.close()
+
+
+def board_source(corpus_path=None, start=0, no_teamups=False,
+                 side=BOARD_SIDE):
+    """
+    Return a callable() returning a new starting board, of side `side`, each
+    call.
+
+    With a `corpus_path`, boards are read in order from that corpus,
+    beginning with board `start` (wrapping around at the end), otherwise
+    they're generated with rand_stable_board.
+
+    Raises ValueError if the corpus holds boards of another side.
+    """
+    if corpus_path is None:
+        return lambda: rand_stable_board(side, no_teamups=no_teamups)
+
+    corpus = BoardCorpus(corpus_path)
+    if corpus.side != side:
+        raise ValueError("Board corpus has side %d, not %d: %s"
+                         % (corpus.side, side, corpus_path))
+    if not len(corpus):
+        raise Exception("Empty board corpus: %s" % corpus_path)
+    if no_teamups and not corpus.no_teamups:
+        raise Exception("Board corpus may have teamups: %s" % corpus_path)
+    nums = [start]
+
+    def _next_board():
+        i = nums[0] % len(corpus)
+        nums[0] = i + 1
+        return corpus.board(i)
+
+    return _next_board
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument('--count', type=int, default=1000000)
+    parser.add_argument('--side', type=int, default=BOARD_SIDE)
+    parser.add_argument('--no-teamups', default=False, action='store_true')
+    parser.add_argument('random_seed', type=int)
+    parser.add_argument('path')
+    args = parser.parse_args()
+    write_corpus(args.path, args.random_seed, args.count, side=args.side,
+                 no_teamups=args.no_teamups)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,5 @@
-from criticals import calc_critical_square
-from gravity import apply_gravity
-from match import find_matches
-from tile_destroyer import destroy_tiles
-from tiles import CriticalTile
+from cascade import resolve_cascade
+import numpy_backend
 
 
 def settle_board(board):
@@ -12,17 +9,9 @@ def settle_board(board):
 
     Returns the stable board.
     """
-    while True:
-        matches = find_matches(board)
+    if numpy_backend.enabled():
+        settled = numpy_backend.settle_board(board)
+        if settled is not None:
+            return settled
 
-        if not matches:
-            break
-
-        new_board, destroyed_sqs = destroy_tiles(board)
-        for match in matches:
-            crit = calc_critical_square(match)
-            if crit:
-                new_board.set_at(crit[0], crit[1], CriticalTile())
-        board, _ = apply_gravity(new_board)
-
-    return board
+    return resolve_cascade(board, moves=False).board
@@ -0,0 +1,167 @@
+"""
+Resolve a cascade: match, destroy, place criticals, drop tiles, and
+(optionally) refill, level after level until the board is stable.
+
+Everything happens on one board, and what happened is returned as a compact
+log, so callers (the game, settling, strategies working out what a move is
+worth) don't each need their own copy of the loop.
+"""
+
+from collections import namedtuple
+
+from constants import MIN_CREATE_CRITICAL, MIN_MOVE_AGAIN
+from criticals import calc_critical_square
+from gravity import apply_gravity, drop_tiles, disturbed_squares, \
+    EMPTY_CODE
+from match import find_matches, _find_new_matches
+from tile_destroyer import squares_to_destroy
+from tiles import EMPTY, CRITICAL
+
+
+Cascade = namedtuple('Cascade',
+                     '''
+                     board
+                     levels
+                     matched_five
+                     ''')
+
+# One level of a cascade:
+#
+#  - `matches`: the matches made
+#
+#  - `destroyed`: sorted ((row, col), tile) for each tile destroyed
+#
+#  - `crits`: (row, col) of each critical placed
+#
+#  - `moved`: sorted ((old_row, old_col), (new_row, new_col)) for each tile
+#    that fell, or None if moves weren't asked for
+#
+#  - `filled`: ((row, col), tile) for each square refilled, in the order
+#    they were filled
+CascadeLevel = namedtuple('CascadeLevel',
+                          '''
+                          matches
+                          destroyed
+                          crits
+                          moved
+                          filled
+                          ''')
+
+
+def resolve_cascade(board, refill=None, in_place=False, moves=True,
+                    matches=None, max_levels=None, straight_crits_only=False,
+                    on_destroy=None):
+    """
+    Resolve every match on `board`, and those that follow as tiles fall,
+    until no matches are left.
+
+    - `refill`: a callable() returning a tile for each empty square after
+      tiles fall, or None to leave them empty.
+
+    - `in_place`: if True, `board` itself is changed, otherwise a copy.
+
+    - `moves`: if False, don't record which tiles fell (cheaper).
+
+    - `matches`: the board's matches, if the caller already has them.
+
+    - `max_levels`: if not None, stop after that many levels, even if there
+      are matches left.
+
+    - `straight_crits_only`: if True, only matches with a straight run of
+      MIN_CREATE_CRITICAL make a critical (the game's rule), rather than
+      every match calc_critical_square places one for.
+
+    - `on_destroy`: a callable(board, squares) called at each level with the
+      squares about to be destroyed, while `board` still holds their tiles.
+
+    Returns a Cascade, with the resolved board and a CascadeLevel per level.
+    """
+    if not in_place:
+        board = board.copy()
+    side = board.side
+
+    if matches is None:
+        matches = find_matches(board)
+
+    levels = []
+    matched_five = False
+    while matches:
+        matched_five = matched_five or any(
+            m.has_extent_at_least(MIN_MOVE_AGAIN) for m in matches)
+
+        destroyed = [((row, col), board.at(row, col))
+                     for row, col in squares_to_destroy(matches, side)]
+        if on_destroy is not None:
+            on_destroy(board, [square for square, _ in destroyed])
+        for (row, col), _ in destroyed:
+            board.set_at(row, col, EMPTY)
+
+        crits = []
+        for match in matches:
+            if (straight_crits_only and
+                    not match.has_extent_at_least(MIN_CREATE_CRITICAL)):
+                continue
+            crit = calc_critical_square(match)
+            if crit:
+                board.set_at(crit[0], crit[1], CRITICAL)
+                crits.append(crit)
+
+        changed = [square for square, _ in destroyed]
+        if moves:
+            _, moved = apply_gravity(board, in_place=True)
+            changed.extend(new for _, new in moved)
+        else:
+            moved = None
+            _, changed_depths = drop_tiles(board, in_place=True)
+            changed.extend((depth - 1, col)
+                           for col, depth in enumerate(changed_depths)
+                           if depth)
+
+        filled = []
+        if refill is not None:
+            filled = refill_empty_squares(board, refill)
+            changed.extend(square for square, _ in filled)
+
+        levels.append(CascadeLevel(matches=matches,
+                                   destroyed=destroyed,
+                                   crits=crits,
+                                   moved=moved,
+                                   filled=filled))
+        if max_levels is not None and len(levels) >= max_levels:
+            break
+
+        # only the columns that lost tiles have changed
+        matches = _find_new_matches(board, disturbed_squares(changed))
+
+    return Cascade(board=board, levels=levels, matched_five=matched_five)
+
+
+def ap_by_color(levels, colors=None):
+    """
+    Return a dict of color -> AP earned by the tiles destroyed over
+    `levels` (CascadeLevels), counting only `colors` if not None.
+    """
+    ap = dict()
+    for level in levels:
+        for _, tile in level.destroyed:
+            tile_ap = tile.ap()
+            if tile_ap and (colors is None or tile_ap[0] in colors):
+                ap[tile_ap[0]] = ap.get(tile_ap[0], 0) + tile_ap[1]
+    return ap
+
+
+def refill_empty_squares(board, refill):
+    """
+    Fill each empty square on `board` with a tile from `refill`(), from the
+    bottom right.
+
+    Returns ((row, col), tile) for each square filled, in order.
+    """
+    filled = []
+    codes = board.codes
+    for (row, col) in board.squares_from_bottom_right():
+        if codes[row * board.side + col] == EMPTY_CODE:
+            tile = refill()
+            board.set_at(row, col, tile)
+            filled.append(((row, col), tile))
+    return filled
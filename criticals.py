@@ -62,7 +62,7 @@ def _find_intersections(match):
                max([s[1] for s in match.squares])) + 1
     intersections = []
     for row, col in match.squares:
-        ns = [n for n in neighbors(row, col, side) if n in match.squares]
+        ns = [n for n in neighbors(row, col, side) if n in match]
         if any(n[0] == row for n in ns) and any(n[1] == col for n in ns):
             intersections.append((row, col))
     return intersections
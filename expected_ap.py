@@ -0,0 +1,143 @@
+"""
+Expected AP of moves, counting the tiles that fall in after them.
+
+What a move destroys before anything is refilled is fixed, but the refill
+is random, and cascades it sets off (often most of what a match near the
+bottom of the board earns) can only be estimated, by sampling refills.
+
+Only the move's first level (its own matches, and the tiles falling into
+their place) is the same for every refill, so it's resolved once per move
+and each sample carries on from there.  Moves are sampled a round at a
+time, and a move is dropped as soon as it's clearly behind the leader, so
+only close calls get the full number of samples.
+
+Samples are worked out one at a time, each by resolving the rest of its
+cascade in Python.  They aren't vectorized across samples (as the NumPy
+backend does for candidate swaps): every refill sets off a different
+cascade, so samples don't share a shape to batch, and early dropping
+already saves most of the samples a fixed batch would run.
+"""
+
+import math
+
+from anytime import until
+from cascade import ap_by_color, resolve_cascade, refill_empty_squares
+from gravity import disturbed_squares
+from match import _find_new_matches
+from tiles import new_rand_tile
+
+
+# max samples of each move
+DEFAULT_SAMPLES = 32
+
+# samples of each move before any is dropped
+MIN_SAMPLES = 8
+
+# standard errors apart two moves' mean AP must be to tell them apart
+SEPARATION = 2.0
+
+
+def expected_aps(board, moves_with_matches, colors,
+                 samples=DEFAULT_SAMPLES, min_samples=MIN_SAMPLES,
+                 separation=SEPARATION, deadline=None):
+    """
+    Return a list with, for each of `moves_with_matches` (see
+    strategy.find_moves) looked at, a list of the mean AP earned in each of
+    `colors` over its samples.
+
+    Moves are ranked as by strategy.create_ap_seeking_strat: by mean AP in
+    the first color, then the next, etc.  After `min_samples` rounds, any
+    move whose means are `separation` standard errors behind the leader's
+    (in the first color where they differ) stops being sampled, and sampling
+    stops once only the leader is left, or after `samples` rounds, or (after
+    the first round) once `deadline` (see anytime) passes.
+
+    Resolving each move's first level is the biggest fixed cost, so that
+    stops at the deadline too, and only the moves from the first up to
+    there are looked at (at least the first).
+    """
+    colors = list(colors)
+    move_samples = [_MoveSamples(board, mwm, colors)
+                    for mwm in until(deadline, moves_with_matches)]
+    live = list(move_samples)
+    for num in until(deadline, range(1, samples + 1)):
+        for ms in live:
+            ms.sample()
+        if num >= min_samples and len(live) > 1:
+            leader = max(live, key=lambda ms: ms.means())
+            live = [ms for ms in live
+                    if ms is leader or not _behind(ms, leader, separation)]
+            if len(live) == 1:
+                break
+    return [ms.means() for ms in move_samples]
+
+
+def _behind(ms, leader, separation):
+    """
+    Return whether `ms` is clearly behind `leader`.
+    """
+    for mean, var, leader_mean, leader_var in zip(ms.means(),
+                                                  ms.variances(),
+                                                  leader.means(),
+                                                  leader.variances()):
+        std_err = math.sqrt(var / ms.num + leader_var / leader.num)
+        if not std_err:
+            if mean == leader_mean:
+                # no telling them apart in this color, so on to the next
+                continue
+            return mean < leader_mean
+        return leader_mean - mean > separation * std_err
+    return False
+
+
+class _MoveSamples(object):
+    """
+    Running totals of the AP a move earns, by color, over refill samples.
+    """
+
+    __slots__ = ('_board', '_squares', '_ap', '_colors',
+                 'num', '_sums', '_sq_sums')
+
+    def __init__(self, board, mwm, colors):
+        swapped = board.copy()
+        swapped.swap(mwm.from_sq[0], mwm.from_sq[1],
+                     mwm.to_sq[0], mwm.to_sq[1])
+        first = resolve_cascade(swapped, in_place=True, moves=False,
+                                matches=mwm.matches, max_levels=1)
+        self._board = first.board
+        self._squares = [square for square, _ in first.levels[0].destroyed]
+        self._colors = colors
+        self._ap = _ap(first.levels, colors)
+        self.num = 0
+        self._sums = [0] * len(colors)
+        self._sq_sums = [0] * len(colors)
+
+    def sample(self):
+        board = self._board.copy()
+        filled = refill_empty_squares(board, new_rand_tile)
+        changed = self._squares + [square for square, _ in filled]
+        matches = _find_new_matches(board, disturbed_squares(changed))
+        rest = resolve_cascade(board, refill=new_rand_tile, in_place=True,
+                               moves=False, matches=matches)
+        ap = [a + b for a, b in zip(self._ap, _ap(rest.levels, self._colors))]
+        self.num += 1
+        for i, n in enumerate(ap):
+            self._sums[i] += n
+            self._sq_sums[i] += n * n
+
+    def means(self):
+        return [float(s) / self.num for s in self._sums]
+
+    def variances(self):
+        """
+        Sample variances of the AP in each color.
+        """
+        if self.num < 2:
+            return [0.0] * len(self._sums)
+        return [max(0.0, (sq - float(s) * s / self.num) / (self.num - 1))
+                for s, sq in zip(self._sums, self._sq_sums)]
+
+
+def _ap(levels, colors):
+    ap = ap_by_color(levels, colors)
+    return [ap.get(color, 0) for color in colors]
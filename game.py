@@ -5,14 +5,12 @@ The game itself, with turns and back and forth and all that.
 from collections import namedtuple
 from itertools import cycle
 import random
+import time
 
-from criticals import calc_critical_square
-from constants import MIN_MOVE_AGAIN, MIN_CREATE_CRITICAL
-from gravity import apply_gravity
+from cascade import resolve_cascade
 from match import find_matches
-from strategy import find_moves
-from tile_destroyer import destroy_tiles
-from tiles import new_rand_tile, CriticalTile
+from strategy import has_any_move
+from tiles import new_rand_tile
 
 
 GameState = namedtuple('GameState',
@@ -23,13 +21,20 @@ GameState = namedtuple('GameState',
                        to_move
                        move_count
                        turn_count
+                       history
                        ''')
 
+# GameState.history is a list of (player, move) for each move picked so far
+# in the game, in order, with move None where the player didn't move, and
+# (None, None) where the board was reshuffled.  It's the same list for the
+# whole game.  States built without one have None.
+GameState.__new__.__defaults__ = (None,)
+
 
 class Game(object):
 
     def __init__(self, board, offense, defense, stop_condition,
-                 pre_move=None):
+                 pre_move=None, move_time=None):
         """
         - `board`: a Board object containing the initial position
 
@@ -42,6 +47,9 @@ class Game(object):
 
         - `pre_move`: a callable(GameState) that will be invoked before each
           move.
+
+        - `move_time`: if not None, the seconds each player has to pick a
+          move (see Player.pick_move).
         """
         self.board = board
         self.offense = offense
@@ -51,7 +59,12 @@ class Game(object):
         self.stop_condition = stop_condition
         self.move_count = 0
         self.turn_count = 1
+        self.history = []
         self.pre_move = pre_move
+        self.move_time = move_time
+        # seconds taken by each pick_move, and how many ran to the deadline
+        self.latencies = []
+        self.deadlines_hit = 0
 
     def play(self):
         while not self.stop_condition(self._game_state()):
@@ -64,29 +77,54 @@ class Game(object):
         self.move_count += 1
 
         matched_five = False
-        to_swap = self.to_move.pick_move(self._game_state())
+        to_swap = self._pick_move()
+        self.history.append((self.to_move, to_swap))
 
         if to_swap:
             self._apply_swap(to_swap)
 
-            while True:
-                matches = find_matches(self.board)
-                if not matches:
-                    break
-                matched_five = matched_five or _has_five_match(matches)
-                self._destroy_tiles()
-                self._place_criticals(matches)
-                self._apply_gravity()
-                self._fill_empty_squares()
+            cascade = resolve_cascade(self.board, refill=new_rand_tile,
+                                      in_place=True,
+                                      straight_crits_only=True,
+                                      on_destroy=self._destroy_tiles)
+            for level in cascade.levels:
+                self._tiles_moved(level.moved)
+            matched_five = cascade.matched_five
 
         if not matched_five:
             self.to_move = next(self.players)
             if self.to_move == self.offense:
                 self.turn_count += 1
 
+    def latency_stats(self):
+        """
+        Return a dict of the number of moves picked, the mean and max
+        seconds taken to pick one, and how many of them ran to the deadline.
+        """
+        latencies = self.latencies
+        return dict(decisions=len(latencies),
+                    mean=sum(latencies) / len(latencies) if latencies else 0.0,
+                    max=max(latencies) if latencies else 0.0,
+                    deadlines_hit=self.deadlines_hit)
+
+    def _pick_move(self):
+        start = time.time()
+        deadline = None
+        if self.move_time is None:
+            to_swap = self.to_move.pick_move(self._game_state())
+        else:
+            deadline = start + self.move_time
+            to_swap = self.to_move.pick_move(self._game_state(),
+                                             deadline=deadline)
+        end = time.time()
+        self.latencies.append(end - start)
+        if deadline is not None and end >= deadline:
+            self.deadlines_hit += 1
+        return to_swap
+
     def _ensure_playable_board(self):
-        while not (find_moves(self.board, stop_after=1)
-                   and not find_matches(self.board, stop_after=1)):
+        while (find_matches(self.board, stop_after=1) or
+               not has_any_move(self.board)):
             self._shuffle_board()
 
     def _shuffle_board(self):
@@ -101,42 +139,24 @@ class Game(object):
                                               new_row, new_col)
             self.defense.update_tiles_swapped(old_row, old_col,
                                               new_row, new_col)
+        self.history.append((None, None))
 
-    def _destroy_tiles(self):
-        new_board, destroyed_squares = destroy_tiles(self.board)
-
+    def _destroy_tiles(self, board, destroyed_squares):
         for row, col in destroyed_squares:
             self.offense.update_destroyed_tile(
-                row, col, self.board,
+                row, col, board,
                 self.to_move == self.offense)
             self.defense.update_destroyed_tile(
-                row, col, self.board,
+                row, col, board,
                 self.to_move == self.defense)
 
-        self.board = new_board
-
-    def _place_criticals(self, matches):
-        for match in matches:
-            if match.has_extent_at_least(MIN_CREATE_CRITICAL):
-                row, col = calc_critical_square(match)
-                self.board.set_at(row, col, CriticalTile())
-
-    def _apply_gravity(self):
-        new_board, tiles_moved = apply_gravity(self.board)
-
+    def _tiles_moved(self, tiles_moved):
         for ((old_row, old_col), (new_row, new_col)) in tiles_moved:
             self.offense.update_tile_position(old_row, old_col,
                                               new_row, new_col)
             self.defense.update_tile_position(old_row, old_col,
                                               new_row, new_col)
 
-        self.board = new_board
-
-    def _fill_empty_squares(self):
-        for (row, col) in self.board.squares_from_bottom_right():
-            if self.board.at(row, col).is_empty():
-                self.board.set_at(row, col, new_rand_tile())
-
     def _apply_swap(self, to_swap):
         self.board.swap(to_swap[0][0],
                         to_swap[0][1],
@@ -159,8 +179,5 @@ class Game(object):
                          defense=self.defense,
                          to_move=self.to_move,
                          move_count=self.move_count,
-                         turn_count=self.turn_count)
-
-
-def _has_five_match(matches):
-    return any(m.has_extent_at_least(MIN_MOVE_AGAIN) for m in matches)
+                         turn_count=self.turn_count,
+                         history=self.history)
@@ -1,7 +1,13 @@
 # rework to just bring tiles down
 
+import numpy_backend
+from tiles import tile_code, EMPTY
 
-def apply_gravity(board):
+
+EMPTY_CODE = tile_code(EMPTY)
+
+
+def apply_gravity(board, in_place=False):
     """
     Returns (new_board, tiles_moved)
 
@@ -12,18 +18,83 @@ def apply_gravity(board):
       - `tiles_moved` is a sorted list of ((old_row, old_col), (new_row,
         new_col)) tuples for each tile in new_board which was in a different
         square in the original board.
+
+    If `in_place` is True, `board` itself is changed and returned as
+    `new_board`.
+    """
+    if numpy_backend.enabled() and not in_place:
+        return numpy_backend.apply_gravity(board)
+
+    if not in_place:
+        board = board.copy()
+    moved = []
+    for col in range(board.side):
+        _drop_column(board, col, moved)
+    return board, sorted(moved)
+
+
+def drop_tiles(board, in_place=False):
+    """
+    Same as apply_gravity, but cheaper for callers that don't need to know
+    which tiles moved.
+
+    Returns (new_board, changed_depths), where `changed_depths` is a list
+    with, for each column, how many squares from the top gravity changed (0
+    if nothing fell): the squares a caller has to look at again, not how far
+    the tiles fell.  E.g. a tile falling one square, from row 2 to 3,
+    changes 4 squares, rows 0 to 3.
     """
-    board = board.copy()
-    moved = dict()
+    if not in_place:
+        board = board.copy()
+    return board, [_drop_column(board, col, None)
+                   for col in range(board.side)]
+
 
-    # start from the bottom, then we only have to move once--look above until
-    # non-empty, if ever, and swap
-    for row, col in board.squares_from_bottom_right():
-        if board.at(row, col).is_empty():
-            for r in reversed(range(row)):
-                if not board.at(r, col).is_empty():
-                    board.swap(row, col, r, col)
-                    moved[(r, col)] = (row, col)
-                    break
+def _drop_column(board, col, moved):
+    """
+    Drop the tiles in `col` of `board` in one pass from the bottom, each
+    straight to its final square, appending ((old_row, col), (new_row,
+    col)) to `moved` (if not None) for each that falls.
+
+    Returns how many squares from the top changed (see drop_tiles).
+    """
+    side = board.side
+    codes = board.codes
+    # the next square, from the bottom, a tile will land in
+    land = side - 1
+    lowest_empty = -1
+    for row in reversed(range(side)):
+        if codes[row * side + col] == EMPTY_CODE:
+            if lowest_empty < 0:
+                lowest_empty = row
+            continue
+        if land != row:
+            board.set_at(land, col, board.at(row, col))
+            if moved is not None:
+                moved.append(((row, col), (land, col)))
+        land -= 1
+    if land >= lowest_empty:
+        # nothing fell
+        return 0
+    for row in range(land + 1):
+        if codes[row * side + col] != EMPTY_CODE:
+            board.set_at(row, col, EMPTY)
+    return lowest_empty + 1
 
-    return board, sorted(list(moved.items()))
+
+def disturbed_squares(changed_squares):
+    """
+    Return every square in the columns of `changed_squares`, from the top
+    down to the lowest of them.
+
+    Passed the squares destroyed in a cascade step, those tiles fell into,
+    and any refilled, this covers every square whose tile changed: so any
+    new match has to include one of them, since every match among the other
+    tiles was just destroyed.
+    """
+    lowest = dict()
+    for row, col in changed_squares:
+        lowest[col] = max(row, lowest.get(col, row))
+    return [(row, col)
+            for col, low in sorted(lowest.items())
+            for row in range(low + 1)]
@@ -1,7 +1,39 @@
 import hashlib
+import random
 
 
 def md5(s):
     m = hashlib.md5()
     m.update(s)
     return m.hexdigest()
+
+
+MASK_64 = (1 << 64) - 1
+
+# fixed, so that hashes are stable across runs and processes
+ZOBRIST_SEED = 0x5eed
+
+# Number of possible one byte tile codes
+NUM_CODES = 256
+
+_ZOBRIST = []
+
+
+def zobrist_table(num_squares):
+    """
+    Return a flat list of random 64 bit keys, indexed by (square << 8) | code,
+    covering at least `num_squares` squares.
+
+    Keys for code 0 (an empty square) are all 0, so an empty board hashes to
+    0.
+
+    The same list is shared (and grown as needed) across calls.
+    """
+    if len(_ZOBRIST) < num_squares * NUM_CODES:
+        rng = random.Random(ZOBRIST_SEED)
+        keys = []
+        for _square in range(num_squares):
+            keys.append(0)
+            keys.extend(rng.getrandbits(64) for _ in range(NUM_CODES - 1))
+        _ZOBRIST[:] = keys
+    return _ZOBRIST
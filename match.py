@@ -2,17 +2,73 @@
 Utilities for finding matches in a board.
 """
 
-import itertools
-import operator
+import heapq
 
+import bitboard
 import board_aware_cache
-from constants import MIN_MATCH
+from constants import BOARD_SIDE, MIN_MATCH
+import numpy_backend
+
+
+# bits per row in a Match's mask, so a standard board's squares fit in 64
+MASK_STRIDE = BOARD_SIDE
+
+
+def mask_stride(side):
+    """
+    Return the bits per row in the masks of matches on a board of side
+    `side`: MASK_STRIDE, unless the board is wider.
+    """
+    return max(MASK_STRIDE, side)
+
+
+def square_bit(row, col, stride=MASK_STRIDE):
+    if not 0 <= col < stride:
+        raise Exception("Bad col num for a match: %s" % col)
+    return 1 << (row * stride + col)
 
 
 class Match(object):
+    """
+    A set of squares, held as a mask with one bit per square (see
+    square_bit), `stride` bits per row.  Matches on one board share a
+    stride (see mask_stride), and only matches with the same stride are
+    equal.
+
+    The squares, extents and the like are worked out from the mask when
+    first asked for, and remembered.
+    """
 
-    def __init__(self, squares):
-        self.squares = sorted(squares)
+    def __init__(self, squares, stride=MASK_STRIDE):
+        mask = 0
+        for row, col in squares:
+            mask |= square_bit(row, col, stride)
+        self.mask = mask
+        self.stride = stride
+        self._squares = None
+        self._max_extents = None
+        self._longest_extent = None
+
+    @classmethod
+    def from_mask(cls, mask, stride=MASK_STRIDE):
+        match = cls([], stride)
+        match.mask = mask
+        return match
+
+    @property
+    def squares(self):
+        """
+        The squares, sorted.
+        """
+        if self._squares is None:
+            squares = []
+            mask = self.mask
+            while mask:
+                low = mask & -mask
+                squares.append(divmod(low.bit_length() - 1, self.stride))
+                mask ^= low
+            self._squares = squares
+        return self._squares
 
     def __str__(self):
         return "Match([%s])" % ", ".join([str(s) for s in self.squares])
@@ -21,26 +77,53 @@ class Match(object):
         return str(self)
 
     def __eq__(self, other):
-        return isinstance(other, Match) and self.squares == other.squares
+        return (isinstance(other, Match) and self.mask == other.mask and
+                self.stride == other.stride)
+
+    def __ne__(self, other):
+        return not self == other
 
     def __hash__(self):
-        return hash(tuple(self.squares))
+        return hash(self.mask)
 
     def __cmp__(self, other):
-        return cmp(self.squares, other.squares)
+        """
+        Same order as comparing the sorted lists of squares.
+        """
+        diff = self.mask ^ other.mask
+        if not diff:
+            return 0
+        low = diff & -diff
+        # whichever holds the first square they don't share sorts first,
+        # unless the other has no squares left past it
+        if self.mask & low:
+            return -1 if other.mask & ~(low - 1) else 1
+        return 1 if self.mask & ~(low - 1) else -1
 
     def __contains__(self, square_coord):
-        return square_coord in self.squares
+        row, col = square_coord
+        if not 0 <= col < self.stride:
+            return False
+        return bool(self.mask & square_bit(row, col, self.stride))
 
     @property
     def tile_count(self):
-        return len(self.squares)
+        return bin(self.mask).count('1')
 
     def has_extent_at_least(self, ext):
-        extents = self.max_extents
-        return (any(v >= ext
-                    for v
-                    in extents['rows'].values() + extents['cols'].values()))
+        longest = self.longest_extent
+        return longest > 0 and longest >= ext
+
+    @property
+    def longest_extent(self):
+        """
+        The longest of the `max_extents`, or 0 if there are none.
+        """
+        if self._longest_extent is None:
+            extents = self.max_extents
+            self._longest_extent = max(extents['rows'].values() +
+                                       extents['cols'].values() + [0])
+        return self._longest_extent
 
     @property
     def max_extents(self):
@@ -55,28 +138,34 @@ class Match(object):
         Where `extent` is the max number of contiguous tiles matches in that
         row or col.
         """
-        squares = list(self.squares)
-
-        _row = lambda s: s[0]
-        _col = lambda s: s[1]
-
-        rows_max_extents = {
-            row: max_extent
-            for row, max_extent
-            in _max_extents(squares,
-                            _row,
-                            _col)
-            if max_extent >= MIN_MATCH}
-        cols_max_extents = {
-            col: max_extent
-            for col, max_extent
-            in _max_extents(squares,
-                            _col,
-                            _row)
-            if max_extent >= MIN_MATCH}
-
-        return dict(rows=rows_max_extents,
-                    cols=cols_max_extents)
+        if self._max_extents is None:
+            rows_max_extents = dict()
+            # col -> bits of the rows holding squares in it
+            col_bits = dict()
+            stride = self.stride
+            row_mask = (1 << stride) - 1
+            mask = self.mask
+            row = 0
+            while mask:
+                row_bits = mask & row_mask
+                extent = _longest_run(row_bits)
+                if extent >= MIN_MATCH:
+                    rows_max_extents[row] = extent
+                while row_bits:
+                    low = row_bits & -row_bits
+                    col = low.bit_length() - 1
+                    col_bits[col] = col_bits.get(col, 0) | (1 << row)
+                    row_bits ^= low
+                mask >>= stride
+                row += 1
+            cols_max_extents = dict()
+            for col, bits in col_bits.items():
+                extent = _longest_run(bits)
+                if extent >= MIN_MATCH:
+                    cols_max_extents[col] = extent
+            self._max_extents = dict(rows=rows_max_extents,
+                                     cols=cols_max_extents)
+        return self._max_extents
 
     def combine(self, other):
         """
@@ -87,10 +176,10 @@ class Match(object):
         No checking is performed around whether this combination makes sense
         (e.g. whether there are any overlapping squares).
         """
-        return Match(list(set(self.squares + other.squares)))
+        return Match.from_mask(self.mask | other.mask, self.stride)
 
     def contains_match(self, other):
-        return set(self.squares) >= set(other.squares)
+        return not other.mask & ~self.mask
 
     def color(self, board):
         for (row, col) in self.squares:
@@ -99,17 +188,15 @@ class Match(object):
                 return ap[0]
 
 
-def _max_extents(squares, group_key, extent_key):
-    squares.sort(key=group_key)
-    for g_key, g_squares in itertools.groupby(squares, group_key):
-        exts = [extent_key(s) for s in g_squares]
-        exts.sort()
-        # shamelessly adapted from the python itertools recipes
-        _ind_minus_elem = lambda (i, x): i - x
-        yield (g_key,
-               max([len(list(adj))
-                    for (_, adj)
-                    in itertools.groupby(enumerate(exts), _ind_minus_elem)]))
+def _longest_run(bits):
+    """
+    Return the length of the longest run of set bits in `bits`.
+    """
+    length = 0
+    while bits:
+        bits &= bits >> 1
+        length += 1
+    return length
 
 
 def find_matches(board, stop_after=None):
@@ -119,109 +206,302 @@ def find_matches(board, stop_after=None):
     If `stop_after` is not None, returns that many matches at most.
 
     If there are no matches, returns an empty list.
+
+    Where criticals join runs of more than one color, which run they are
+    combined with is decided in sorted order (see _combine_matches), so
+    the result is the same whichever engine found the runs.
     """
     cached = board_aware_cache.get('find_matches', board, stop_after)
-    if cached:
+    if cached is not None:
         return cached
 
-    matches = set()
-    for row in range(board.side):
-        for col in range(board.side):
-            matches.update(set(find_matches_at(row, col, board)))
-            if stop_after is not None and len(matches) >= stop_after:
-                sorted_matches = sorted(list(matches)[:stop_after])
-                board_aware_cache.set('find_matches', board, stop_after,
-                                      sorted_matches)
-                return sorted_matches
-
-    matches_l = list(matches)
+    runs = None
+    if numpy_backend.enabled():
+        runs = numpy_backend.find_runs(board)
+    if runs is None:
+        runs = bitboard.find_runs(board)
+    if runs is None:
+        matches = _scan_matches(board, stop_after)
+    else:
+        stride = mask_stride(board.side)
+        matches = set(Match(run, stride) for run in runs)
+
+    if stop_after is not None and len(matches) >= stop_after:
+        sorted_matches = sorted(matches)[:stop_after]
+        board_aware_cache.set('find_matches', board, stop_after,
+                              sorted_matches)
+        return sorted_matches
+
+    sorted_matches = _combine_matches(matches, board)
+    board_aware_cache.set('find_matches', board, None, sorted_matches)
+    if stop_after is not None:
+        # fewer than stop_after, so this is the answer for stop_after too
+        board_aware_cache.set('find_matches', board, stop_after,
+                              sorted_matches)
+    return sorted_matches
+
+
+def _find_new_matches(board, squares):
+    """
+    Same as find_matches, for a board where every match must include one of
+    `squares`--e.g. a board that was stable until the tiles at `squares` were
+    swapped.  On any other board, matches elsewhere are missed, which is why
+    this is only for the cascade and move finding code that knows which
+    squares changed.
+
+    Only looks at the rows and cols through `squares`.  Results are cached
+    under their own 'find_new_matches' namespace, keyed by `squares`, so a
+    partial scan never stands in for find_matches' answer.
+    """
+    cached = board_aware_cache.get('find_matches', board, None)
+    if cached is not None:
+        return cached
+    key = frozenset(tuple(square) for square in squares)
+    cached = board_aware_cache.get('find_new_matches', board, key)
+    if cached is not None:
+        return cached
+
+    runs = bitboard.find_runs_through(board, squares)
+    if runs is None:
+        return find_matches(board)
+
+    stride = mask_stride(board.side)
+    sorted_matches = _combine_matches(set(Match(run, stride) for run in runs),
+                                      board)
+    board_aware_cache.set('find_new_matches', board, key, sorted_matches)
+    return sorted_matches
+
+
+def _combine_matches(matches, board):
+    """
+    Combine overlapping `matches` whose tiles all match each other, and
+    return the results sorted.
+
+    Matches are taken in sorted order, whatever order they're given in.
+    That decides which run criticals next to more than one color join, so
+    results are canonical, but they can differ from the old pairwise loop,
+    which took matches in set order: e.g. a column of criticals between a
+    G below and R rows through it now joins the R rows.
+
+    Matches are partitioned into disjoint sets, each tracking its color (None
+    while it's all criticals), so a merge is a color check rather than a
+    comparison of every pair of tiles, and overlaps are found through an
+    index of square -> matches rather than by trying every pair.
+    """
+    matches_l = sorted(matches)
     length = len(matches_l)
-    i = 0
-    while i < length:
-        if matches_l[i] is None:
-            i += 1
+    stride = mask_stride(board.side)
+    colors = [m.color(board) for m in matches_l]
+
+    # square -> indices of the matches holding it
+    holders = dict()
+    for i, m in enumerate(matches_l):
+        for square in m.squares:
+            holders.setdefault(square, []).append(i)
+
+    # index of the set each match has been put in
+    owners = [None] * length
+    combined = []
+    for i in range(length):
+        if owners[i] is not None:
             continue
-        combined = False
-        for j in range(i, length):
-            if i == j:
+        owners[i] = i
+        color = colors[i]
+        mask = matches_l[i].mask
+        # Grow the set in passes over the later matches, in order, as the
+        # old pairwise loop did, so that an all-critical match goes to the
+        # same set it always has.  Matches overlapping the set later in this
+        # pass go on `this_pass`, ones earlier on `next_pass`.
+        rejected = set()
+        this_pass = [j for j in _overlapping(matches_l[i].squares, holders)
+                     if j > i]
+        heapq.heapify(this_pass)
+        next_pass = []
+        while this_pass or next_pass:
+            if not this_pass:
+                this_pass, next_pass = next_pass, []
+                heapq.heapify(this_pass)
+            j = heapq.heappop(this_pass)
+            if owners[j] is not None or j in rejected:
                 continue
-            m1 = matches_l[i]
-            m2 = matches_l[j]
-            if m2 is None:
+            if (color is not None and colors[j] is not None and
+                    color != colors[j]):
+                # the set's color is fixed, so j can never join it
+                rejected.add(j)
                 continue
-            if _should_combine(m1, m2, board):
-                matches_l[i] = m1.combine(m2)
-                matches_l[j] = None
-                combined = True
-        if not combined:
-            i += 1
-
-    sorted_matches = sorted(set([m for m in matches_l if m is not None]))
-    board_aware_cache.set('find_matches', board, None, sorted_matches)
-    return sorted_matches
+            owners[j] = i
+            if color is None:
+                color = colors[j]
+            new_mask = matches_l[j].mask & ~mask
+            mask |= new_mask
+            for k in _overlapping(Match.from_mask(new_mask, stride).squares,
+                                  holders):
+                if k > j:
+                    heapq.heappush(this_pass, k)
+                elif k > i:
+                    next_pass.append(k)
+        combined.append(Match.from_mask(mask, stride))
+
+    return sorted(set(combined))
+
 
+def _overlapping(squares, holders):
+    return set(i for square in squares for i in holders[square])
+
+
+class _LineWindows(object):
+    """
+    Precomputed lines and windows for boards of one side.
+
+    Squares are row major indices into the board.  A window is MIN_MATCH
+    squares in a row along a line, held as (line, start), with `line` an
+    index into `lines`.
+    """
 
-def _should_combine(m1, m2, board):
-    if not (set(m1.squares) & set(m2.squares)):
-        return False
-    for s1 in m1.squares:
-        for s2 in m2.squares:
-            if not board.at(s1[0], s1[1]).matches(board.at(s2[0], s2[1])):
+    def __init__(self, side):
+        self.side = side
+        self.squares = [divmod(i, side) for i in range(side * side)]
+        self.rows = [tuple(range(row * side, (row + 1) * side))
+                     for row in range(side)]
+        self.cols = [tuple(range(col, side * side, side))
+                     for col in range(side)]
+        self.lines = self.rows + self.cols
+        self.windows = [(line, start)
+                        for line in range(len(self.lines))
+                        for start in range(side - MIN_MATCH + 1)]
+        self.window_squares = [self.lines[line][start:start + MIN_MATCH]
+                               for line, start in self.windows]
+        # square -> indices of the windows through it
+        self.windows_through = [[] for _ in range(side * side)]
+        for w, squares in enumerate(self.window_squares):
+            for i in squares:
+                self.windows_through[i].append(w)
+
+
+_LINE_WINDOWS = dict()
+
+
+def _line_windows(side):
+    if side not in _LINE_WINDOWS:
+        _LINE_WINDOWS[side] = _LineWindows(side)
+    return _LINE_WINDOWS[side]
+
+
+def _scan_matches(board, stop_after):
+    """
+    Find the uncombined matches by walking each way from the ends of every
+    window of matching tiles.
+
+    Slow, used for boards holding tiles the bitboards can't classify.
+    """
+    tables = _line_windows(board.side)
+    tiles = [board.at(row, col) for row, col in tables.squares]
+    runs = set()
+    for w in range(len(tables.windows)):
+        if _window_matches(tables.window_squares[w], tiles):
+            runs.update(_window_runs(w, tables, tiles))
+    matches = set()
+    for line, first, last in sorted(runs):
+        squares = tables.lines[line][first:last + 1]
+        matches.add(Match([tables.squares[i] for i in squares],
+                          mask_stride(board.side)))
+        if stop_after is not None and len(matches) >= stop_after:
+            return matches
+    return matches
+
+
+def _window_matches(squares, tiles):
+    for j in range(1, len(squares)):
+        tile = tiles[squares[j]]
+        for k in range(j):
+            if not tiles[squares[k]].matches(tile):
                 return False
     return True
 
 
+def _window_runs(w, tables, tiles):
+    """
+    Return the (line, first, last) runs walking forward from the start of
+    matching window `w`, and back from its end.
+    """
+    line, start = tables.windows[w]
+    squares = tables.lines[line]
+    end = start + MIN_MATCH - 1
+    return [(line, start, _walk(squares, tiles, start, 1)),
+            (line, _walk(squares, tiles, end, -1), end)]
+
+
+def _walk(squares, tiles, pos, step):
+    """
+    Return the furthest position along `squares` reachable from `pos`, going
+    `step` at a time, with every tile on the way matching all those before
+    it.
+    """
+    so_far = [tiles[squares[pos]]]
+    cur = pos + step
+    while 0 <= cur < len(squares):
+        tile = tiles[squares[cur]]
+        for prev in so_far:
+            if not prev.matches(tile):
+                return cur - step
+        so_far.append(tile)
+        cur += step
+    return cur - step
+
+
 def find_matches_at(row, col, board):
-    matches = [find_left_match_at(row, col, board),
-               find_right_match_at(row, col, board),
-               find_down_match_at(row, col, board),
-               find_up_match_at(row, col, board)]
+    runs = bitboard.find_runs_at(row, col, board)
+    if runs is None:
+        return _scan_matches_at(row, col, board)
+    stride = mask_stride(board.side)
+    return sorted([Match(run, stride) for run in runs])
+
+
+def _scan_matches_at(row, col, board):
+    tables = _line_windows(board.side)
+    tiles = [board.at(r, c) for r, c in tables.squares]
+    i = row * board.side + col
+    # any match from the square holds a window through it
+    if not any(_window_matches(tables.window_squares[w], tiles)
+               for w in tables.windows_through[i]):
+        return []
+    matches = [_walk_match(tables.rows[row], col, -1, tables, tiles),
+               _walk_match(tables.rows[row], col, 1, tables, tiles),
+               _walk_match(tables.cols[col], row, 1, tables, tiles),
+               _walk_match(tables.cols[col], row, -1, tables, tiles)]
     return sorted([m for m in matches if m])
 
 
+def _walk_match(squares, pos, step, tables, tiles):
+    end = _walk(squares, tiles, pos, step)
+    first, last = min(pos, end), max(pos, end)
+    if last - first + 1 < MIN_MATCH:
+        return None
+    return Match([tables.squares[i] for i in squares[first:last + 1]],
+                 mask_stride(tables.side))
+
+
+def _line_walk_match(row, col, board, step, along_row):
+    tables = _line_windows(board.side)
+    if along_row:
+        squares, pos = tables.rows[row], col
+    else:
+        squares, pos = tables.cols[col], row
+    tiles = dict((i, board.at(*tables.squares[i])) for i in squares)
+    return _walk_match(squares, pos, step, tables, tiles)
+
+
 def find_left_match_at(row, col, board):
-    return _find_match_col(row, col, board, 0, operator.ge, -1)
+    return _line_walk_match(row, col, board, -1, True)
 
 
 def find_right_match_at(row, col, board):
-    return _find_match_col(row, col, board, board.side, operator.lt, 1)
+    return _line_walk_match(row, col, board, 1, True)
 
 
 def find_up_match_at(row, col, board):
-    return _find_match_row(row, col, board, 0, operator.ge, -1)
+    return _line_walk_match(row, col, board, -1, False)
 
 
 def find_down_match_at(row, col, board):
-    return _find_match_row(row, col, board, board.side, operator.lt, 1)
-
-
-def _find_match_col(row, col, board, lim, cmp_lim, incr):
-    so_far = [(row, col)]
-    cur_col = col + incr
-    while cmp_lim(cur_col, lim):
-        if all(board.at(r, c).matches(board.at(row, cur_col))
-               for r, c in so_far):
-            so_far.append((row, cur_col))
-            cur_col += incr
-        else:
-            break
-    if len(so_far) >= MIN_MATCH:
-        return Match(so_far)
-    else:
-        return None
-
-
-def _find_match_row(row, col, board, lim, cmp_lim, incr):
-    so_far = [(row, col)]
-    cur_row = row + incr
-    while cmp_lim(cur_row, lim):
-        if all(board.at(r, c).matches(board.at(cur_row, col))
-               for r, c in so_far):
-            so_far.append((cur_row, col))
-            cur_row += incr
-        else:
-            break
-    if len(so_far) >= MIN_MATCH:
-        return Match(so_far)
-    else:
-        return None
+    return _line_walk_match(row, col, board, 1, False)
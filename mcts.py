@@ -0,0 +1,282 @@
+"""
+Monte Carlo Tree Search strategy.
+
+The greedy strategies in strategy.py judge each move on its own, and only
+on the tiles that are on the board now.  This one plays moves forward: our
+move, the refill (sampled from the tiles that fall in a real game), the
+other side's reply, and so on, a few plies deep, and judges each of our
+moves by the AP it leads to.
+
+The tree is open loop: a node stands for the moves made to reach it, not
+for a board, since every playout through it samples different refills.
+Its children are keyed by the move made and the side to move next (a
+five match, which depends on the refill, means the same side moves
+again), and the moves tried at a node are the ones legal on the board the
+playout reached it with.
+
+Trees are kept between decisions: when the game's history shows the moves
+made since the last one (ours and the other side's), the search picks up
+from the node they lead to.  A tree is dropped once a new game starts, or
+the board is reshuffled.
+"""
+
+import math
+import random
+import time
+
+from anytime import anytime
+import bitboard
+from cascade import ap_by_color, resolve_cascade
+from match import find_matches
+from strategy import find_moves
+from tiles import new_rand_tile
+
+
+DEFAULT_ITERATIONS = 200
+
+# plies played forward from the board being decided on, our moves and the
+# other side's, before a line is scored
+DEFAULT_DEPTH = 4
+
+# weight of the exploration term in UCT, in AP
+DEFAULT_EXPLORATION = 2.0
+
+# max nodes in a tree, across decisions
+DEFAULT_MAX_NODES = 20000
+
+
+def create_mcts_strat(colors, iterations=None, time_budget=None,
+                      depth=DEFAULT_DEPTH, exploration=DEFAULT_EXPLORATION,
+                      max_nodes=DEFAULT_MAX_NODES):
+    """
+    Return a strategy that searches for the move leading to the most AP in
+    `colors` for us, less the AP in `colors` for the other side, over
+    `depth` plies.
+
+    The search stops after `iterations` playouts, or `time_budget` seconds
+    (whichever comes first, if both are given), or after
+    DEFAULT_ITERATIONS playouts if neither is.
+
+    The move tried most is returned, ties broken by the better average,
+    then the lexically earliest move.
+
+    Given a `deadline` (see anytime), the search stops by then at the
+    latest.
+    """
+    if iterations is None and time_budget is None:
+        iterations = DEFAULT_ITERATIONS
+    colors = set(colors)
+    # player -> (root of their last search, the game's history, its length
+    # then)
+    trees = dict()
+
+    @anytime
+    def _mcts_strat(game_state, deadline=None):
+        if time_budget is not None:
+            budget_deadline = time.time() + time_budget
+            if deadline is None or budget_deadline < deadline:
+                deadline = budget_deadline
+        root = _search(_reused_root(trees, game_state) or _Node(),
+                       game_state.board, colors, iterations, deadline, depth,
+                       exploration, max_nodes)
+        us, history = game_state.to_move, game_state.history
+        if history is None:
+            trees.pop(us, None)
+        else:
+            trees[us] = (root, history, len(history))
+        return root.best_move(_legal_moves(game_state.board))
+
+    return _mcts_strat
+
+
+class _Node(object):
+    """
+    Statistics for the moves tried after one line of moves.
+
+    Values are totals of AP for the side to move, less AP for the other.
+    """
+
+    __slots__ = ('visits', 'move_visits', 'move_values', 'children')
+
+    def __init__(self):
+        self.visits = 0
+        self.move_visits = dict()
+        self.move_values = dict()
+        # (move, whether the same side moves next) -> _Node
+        self.children = dict()
+
+    def select(self, moves, exploration):
+        """
+        Return the move of `moves` to try next: the first untried one, or
+        else by UCT.
+        """
+        move_visits = self.move_visits
+        for move in moves:
+            if move not in move_visits:
+                return move
+        log_visits = math.log(self.visits)
+        best = None
+        best_score = None
+        for move in moves:
+            visits = move_visits[move]
+            score = (self.move_values[move] / visits +
+                     exploration * math.sqrt(log_visits / visits))
+            if best_score is None or score > best_score:
+                best, best_score = move, score
+        return best
+
+    def update(self, move, value):
+        self.visits += 1
+        self.move_visits[move] = self.move_visits.get(move, 0) + 1
+        self.move_values[move] = self.move_values.get(move, 0.0) + value
+
+    def best_move(self, moves):
+        """
+        Return the move of `moves` tried most, or None if none were.
+        """
+        tried = [move for move in moves if move in self.move_visits]
+        if not tried:
+            return None
+        return min(tried,
+                   key=lambda move: (-self.move_visits[move],
+                                     -self.move_values[move] /
+                                     self.move_visits[move],
+                                     move))
+
+    def size(self):
+        """
+        Return the number of nodes in the tree below (and including) this.
+        """
+        return 1 + sum(child.size() for child in self.children.values())
+
+
+def _reused_root(trees, game_state):
+    """
+    Return the node of the player to move's last tree (in `trees`, see
+    create_mcts_strat) reached by the moves made since, or None if there
+    isn't one, or it's from another game.
+    """
+    us, history = game_state.to_move, game_state.history
+    if history is None or us not in trees:
+        return None
+    last_root, last_history, num_moves = trees[us]
+    # a new game has a new history
+    if history is not last_history or len(history) < num_moves:
+        return None
+    return _descend(last_root, history[num_moves:], us)
+
+
+def _descend(root, moves_made, us):
+    """
+    Return the node reached from `root` (a node with `us` to move) by
+    `moves_made`, a list of (player, move) as in GameState.history, or None
+    if the tree doesn't reach that far.
+    """
+    node = root
+    for i, (player, move) in enumerate(moves_made):
+        if move is None or (i == 0 and player is not us):
+            return None
+        if i + 1 < len(moves_made):
+            next_player = moves_made[i + 1][0]
+        else:
+            next_player = us
+        from_sq, to_sq = tuple(move[0]), tuple(move[1])
+        key = ((min(from_sq, to_sq), max(from_sq, to_sq)),
+               next_player is player)
+        node = node.children.get(key)
+        if node is None:
+            return None
+    return node
+
+
+def _search(root, board, colors, iterations, deadline, depth, exploration,
+            max_nodes=DEFAULT_MAX_NODES):
+    """
+    Run playouts from `board`, with us to move at `root`, and return
+    `root`.
+    """
+    if not _legal_moves(board):
+        return root
+    num_nodes = [root.size()]
+    done = 0
+    while True:
+        if iterations is not None and done >= iterations:
+            break
+        # always at least one playout, so there's a move to return
+        if deadline is not None and done and time.time() >= deadline:
+            break
+        _playout(root, board, colors, depth, exploration, num_nodes,
+                 max_nodes)
+        done += 1
+    return root
+
+
+def _playout(root, board, colors, depth, exploration, num_nodes, max_nodes):
+    """
+    Play `depth` plies forward from `board`, through the tree from `root`
+    and then by random moves once off its edge, adding at most one node
+    (while the tree has fewer than `max_nodes`), and score the line.
+    """
+    board = board.copy()
+    ours = True
+    node = root
+    added = False
+    # (node, move, ap, ours) for each ply, node None once off the tree
+    plies = []
+    while len(plies) < depth:
+        moves = _legal_moves(board)
+        if not moves:
+            break
+        if node is not None:
+            move = node.select(moves, exploration)
+        else:
+            move = random.choice(moves)
+        ap, matched_five = _play(board, move, colors)
+        plies.append((node, move, ap, ours))
+
+        if node is not None:
+            key = (move, matched_five)
+            child = node.children.get(key)
+            if child is None and not added and num_nodes[0] < max_nodes:
+                child = node.children[key] = _Node()
+                num_nodes[0] += 1
+                added = True
+            node = child
+        if not matched_five:
+            ours = not ours
+
+    # from the last ply back, totalling AP from our side
+    total = 0
+    for node, move, ap, ply_ours in reversed(plies):
+        total += ap if ply_ours else -ap
+        if node is not None:
+            node.update(move, total if ply_ours else -total)
+
+
+def _play(board, move, colors):
+    """
+    Make `move` on `board`, refilling with random tiles.
+
+    Returns (ap in `colors` earned, whether a five was matched).
+    """
+    (row, col), (row_n, col_n) = move
+    board.swap(row, col, row_n, col_n)
+    cascade = resolve_cascade(board, refill=new_rand_tile, in_place=True,
+                              moves=False)
+    ap = sum(ap_by_color(cascade.levels, colors).values())
+    return ap, cascade.matched_five
+
+
+def _legal_moves(board):
+    """
+    Return the legal moves on `board`, sorted, smaller square first.
+
+    Boards in the search are stable (refills cascade until they are), so
+    moves can come from templates rather than trying every swap.
+    """
+    if not find_matches(board, stop_after=1):
+        swaps = bitboard.find_swaps(board)
+        if swaps is not None:
+            return sorted(swaps)
+    return [(tuple(mwm.from_sq), tuple(mwm.to_sq))
+            for mwm in find_moves(board, both_directions=False)]
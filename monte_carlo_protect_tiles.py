@@ -8,9 +8,10 @@ import random
 
 from aimulator import create_ai_strat
 import board_aware_cache
+from board_corpus import board_source
 from game import Game
 from player import Player
-from stable_board import rand_stable_board
+from scoring_pool import ScoringPool
 from strategy import rand_move_strat, create_protect_protects_strat
 from simulation import stop_after_n_turns
 from tiles import ProtectTile
@@ -31,9 +32,9 @@ def mk_print_protection(sim_id, num_protect_tiles):
     return print_protection
 
 
-def run_sim(sim_id, num_protect_tiles, num_turns, use_protect_protects):
+def run_sim(sim_id, board, num_protect_tiles, num_turns,
+            use_protect_protects, pool=None):
     strength = 64.0 / num_protect_tiles
-    board = rand_stable_board(no_teamups=True)
     squares = list(board.squares_from_bottom_right())
     random.shuffle(squares)
 
@@ -44,7 +45,8 @@ def run_sim(sim_id, num_protect_tiles, num_turns, use_protect_protects):
 
     defense_colors = ['G', 'Y', 'R', 'B', 'P', 'T']
     if use_protect_protects:
-        offense = Player(strategy=create_protect_protects_strat('<'))
+        offense = Player(
+            strategy=create_protect_protects_strat('<', pool=pool))
     else:
         offense = Player(strategy=rand_move_strat)
     defense = Player(strategy=create_ai_strat(defense_colors))
@@ -55,16 +57,15 @@ def run_sim(sim_id, num_protect_tiles, num_turns, use_protect_protects):
                 pre_move=mk_print_protection(sim_id, num_protect_tiles),
                 stop_condition=stop_after_n_turns(num_turns))
 
-    board_aware_cache.clear()
-
     game.play()
 
 
-def run_sims(trial, max_protect_tiles, num_turns, use_protect_protects):
+def run_sims(trial, next_board, max_protect_tiles, num_turns,
+             use_protect_protects, pool=None):
     for i in range(max_protect_tiles):
         num_protect_tiles = i + 1
-        run_sim("%s-%s" % (num_protect_tiles, trial),
-                num_protect_tiles, num_turns, use_protect_protects)
+        run_sim("%s-%s" % (num_protect_tiles, trial), next_board(),
+                num_protect_tiles, num_turns, use_protect_protects, pool)
 
 
 def main():
@@ -75,13 +76,36 @@ def main():
     parser.add_argument('--offense-protects-protects',
                         default=False,
                         action='store_true')
+    parser.add_argument('--cache-max-entries', type=int,
+                        default=board_aware_cache.DEFAULT_MAX_ENTRIES)
+    parser.add_argument('--cache-stats',
+                        default=False,
+                        action='store_true')
+    parser.add_argument('--board-corpus')
+    parser.add_argument('--scoring-processes', type=int, default=0)
     parser.add_argument('random_seed', type=int)
     args = parser.parse_args()
     random.seed(args.random_seed)
+    board_aware_cache.configure(max_entries=args.cache_max_entries)
+    if args.cache_stats:
+        board_aware_cache.dump_stats_at_exit()
+
+    # each run reads its own stretch of the corpus
+    num_games = args.num_trials * args.max_protect_tiles
+    next_board = board_source(args.board_corpus,
+                              start=args.random_seed * num_games,
+                              no_teamups=True)
+
+    pool = None
+    if args.scoring_processes:
+        pool = ScoringPool(args.scoring_processes)
 
     for i in range(args.num_trials):
-        run_sims(i, args.max_protect_tiles, args.num_turns,
-                 args.offense_protects_protects)
+        run_sims(i, next_board, args.max_protect_tiles, args.num_turns,
+                 args.offense_protects_protects, pool)
+
+    if pool is not None:
+        pool.close()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,87 @@
+"""
+What a swap does to a board, worked out once and shared.
+
+Strategies weighing up moves all want the same thing: swap, resolve the
+cascade (with no refill, since what falls in is unknown), and total up what
+was destroyed.  Outcomes are kept in a transposition table (the
+'move_outcome' board_aware_cache namespace) keyed by the board's hash and
+the swap, so the same move on the same board, whichever player or strategy
+asks, is only resolved once.
+"""
+
+from collections import namedtuple
+
+import board_aware_cache
+from cascade import ap_by_color, resolve_cascade
+
+
+class MoveOutcome(namedtuple('MoveOutcome',
+                             '''
+                             ap
+                             destroyed
+                             crits
+                             board
+                             matched_five
+                             ''')):
+    """
+    The settled result of a swap:
+
+     - `ap`: dict of color -> AP earned
+
+     - `destroyed`: ((row, col), tile) for each tile destroyed, level by level
+
+     - `crits`: (row, col) of each critical created
+
+     - `board`: the settled board, with destroyed tiles left empty
+
+     - `matched_five`: whether any match was at least MIN_MOVE_AGAIN long
+
+    Outcomes are shared, so none of these should be changed.
+    """
+
+    __slots__ = ()
+
+    def ap_in(self, colors):
+        """
+        Return the total AP earned in `colors`.
+        """
+        return sum(n for color, n in self.ap.items() if color in colors)
+
+    def protection_lost(self, direction):
+        """
+        Return the protection in `direction` held by the tiles destroyed.
+        """
+        return sum(tile.protection(direction) for _, tile in self.destroyed)
+
+
+def move_outcome(board, from_sq, to_sq, matches=None):
+    """
+    Return the MoveOutcome of swapping `from_sq` and `to_sq` on `board`.
+
+    - `matches`: the matches the swap makes, if the caller already has them.
+    """
+    swap = (min(from_sq, to_sq), max(from_sq, to_sq))
+    # both directions of a swap leave the same board
+    key = tuple(tuple(square) for square in swap)
+    cached = board_aware_cache.get('move_outcome', board, key)
+    if cached is not None:
+        return cached
+
+    swapped = board.copy()
+    swapped.swap(from_sq[0], from_sq[1], to_sq[0], to_sq[1])
+    cascade = resolve_cascade(swapped, in_place=True, moves=False,
+                              matches=matches)
+
+    destroyed = []
+    crits = []
+    for level in cascade.levels:
+        destroyed.extend(level.destroyed)
+        crits.extend(level.crits)
+
+    outcome = MoveOutcome(ap=ap_by_color(cascade.levels),
+                          destroyed=destroyed,
+                          crits=crits,
+                          board=cascade.board,
+                          matched_five=cascade.matched_five)
+    board_aware_cache.set('move_outcome', board, key, outcome)
+    return outcome
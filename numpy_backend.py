@@ -0,0 +1,311 @@
+"""
+Optional NumPy backend for matching, destroying tiles, gravity and settling.
+
+A board is held as an int8 (side, side) array of tile codes (see
+tiles.tile_code), alongside the board's dict of special tiles keyed by square
+index.  Runs are found with sliding window comparisons along each axis, rows
+and cols with 4+ matches are cleared with boolean masks, and gravity is a
+stable compaction of each column.
+
+Results are the same as the pure Python code's.  The backend is off unless
+`enable` is called, and can only be enabled if NumPy is installed.  Functions
+here return None for boards holding tiles they can't classify, and callers
+fall back to the pure Python code.
+"""
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from bitboard import CLASS_BY_CODE, CRITICAL_CLASS, UNKNOWN_CLASS, \
+    NUM_CLASSES
+from board import Board, neighbors
+from constants import MIN_MATCH, MIN_DESTROY_ROW_OR_COL, \
+    MIN_CREATE_CRITICAL
+from criticals import calc_critical_square
+import match
+from tiles import tile_code, EMPTY, CRITICAL
+
+
+EMPTY_CODE = tile_code(EMPTY)
+CRITICAL_CODE = tile_code(CRITICAL)
+
+_enabled = False
+
+if np is not None:
+    _CLASSES = np.array(CLASS_BY_CODE, dtype=np.int8)
+
+
+def available():
+    return np is not None
+
+
+def enable(on=True):
+    """
+    Turn the backend on (or off, if `on` is False).
+    """
+    global _enabled
+    if on and np is None:
+        raise Exception("NumPy backend requested, but NumPy isn't installed")
+    _enabled = on
+
+
+def enabled():
+    return _enabled
+
+
+def to_array(board):
+    side = board.side
+    return np.frombuffer(bytes(board.codes),
+                         dtype=np.int8).reshape(side, side).copy()
+
+
+def to_board(codes, specials):
+    return Board.from_codes(codes.shape[0], codes.tobytes(), specials)
+
+
+def _class_masks(codes):
+    """
+    Return a (..., NUM_CLASSES, side, side) bool array, with criticals set
+    for every class, or None if `codes` holds tiles we can't classify.
+
+    `codes` may be a single (side, side) board, or a stack of them.
+    """
+    classes = _CLASSES[codes]
+    if (classes == UNKNOWN_CLASS).any():
+        return None
+    classes = classes[..., np.newaxis, :, :]
+    masks = classes == np.arange(NUM_CLASSES)[:, np.newaxis, np.newaxis]
+    masks |= classes == CRITICAL_CLASS
+    return masks
+
+
+def _has_windows(masks, axis):
+    """
+    Return a bool array, over all but the last three axes of `masks`, that's
+    True where some class has MIN_MATCH in a row along `axis` (-1 or -2).
+    """
+    masks = np.swapaxes(masks, axis, -1)
+    num_windows = masks.shape[-1] - MIN_MATCH + 1
+    if num_windows <= 0:
+        return np.zeros(masks.shape[:-3], dtype=bool)
+    windows = masks[..., :num_windows].copy()
+    for shift in range(1, MIN_MATCH):
+        windows &= masks[..., shift:shift + num_windows]
+    return windows.any(axis=(-3, -2, -1))
+
+
+def _spans(masks):
+    """
+    Find the greedy runs along the last axis of `masks`, a (NUM_CLASSES,
+    lines, side) stack.
+
+    Returns (covered, ends, starts), each (lines, side), where `covered` marks
+    squares in any run, `ends` holds the furthest position a run starting at
+    each position reaches (or -1), and `starts` the earliest position a run
+    ending at each position starts from (or side).
+    """
+    side = masks.shape[-1]
+    covered = np.zeros_like(masks)
+    num_windows = side - MIN_MATCH + 1
+    if num_windows > 0:
+        windows = masks[..., :num_windows].copy()
+        for shift in range(1, MIN_MATCH):
+            windows &= masks[..., shift:shift + num_windows]
+        for shift in range(MIN_MATCH):
+            covered[..., shift:shift + num_windows] |= windows
+
+    pos = np.arange(side)
+    next_gap = np.minimum.accumulate(
+        np.where(covered, side, pos)[..., ::-1], axis=-1)[..., ::-1]
+    prev_gap = np.maximum.accumulate(np.where(covered, -1, pos), axis=-1)
+    ends = np.where(covered, next_gap - 1, -1).max(axis=0)
+    starts = np.where(covered, prev_gap + 1, side).min(axis=0)
+    return covered.any(axis=0), ends, starts
+
+
+def _line_runs(ends, starts, transposed):
+    pos = np.arange(ends.shape[-1])
+    pairs = set()
+    for line, first in zip(*np.nonzero(ends - pos + 1 >= MIN_MATCH)):
+        pairs.add((int(line), int(first), int(ends[line, first])))
+    for line, last in zip(*np.nonzero(pos - starts + 1 >= MIN_MATCH)):
+        pairs.add((int(line), int(starts[line, last]), int(last)))
+    if transposed:
+        return set(tuple((p, line) for p in range(first, last + 1))
+                   for line, first, last in pairs)
+    return set(tuple((line, p) for p in range(first, last + 1))
+               for line, first, last in pairs)
+
+
+def find_runs(board):
+    """
+    Same as bitboard.find_runs.
+    """
+    masks = _class_masks(to_array(board))
+    if masks is None:
+        return None
+    _, ends, starts = _spans(masks)
+    runs = _line_runs(ends, starts, False)
+    _, ends, starts = _spans(masks.transpose(0, 2, 1))
+    runs.update(_line_runs(ends, starts, True))
+    return runs
+
+
+def _destroyed(masks):
+    """
+    Return (matched, destroyed), (side, side) bool arrays of the squares in
+    matches, and of those plus any rows / cols cleared by 4+ matches.
+    """
+    side = masks.shape[-1]
+    pos = np.arange(side)
+    row_covered, row_ends, _ = _spans(masks)
+    col_covered, col_ends, _ = _spans(masks.transpose(0, 2, 1))
+    matched = row_covered | col_covered.T
+    destroyed = matched.copy()
+    destroyed[(row_ends - pos + 1).max(axis=1) >=
+              MIN_DESTROY_ROW_OR_COL, :] = True
+    destroyed[:, (col_ends - pos + 1).max(axis=1) >=
+              MIN_DESTROY_ROW_OR_COL] = True
+    return matched, destroyed
+
+
+def _destroy(codes, specials, destroyed):
+    codes[destroyed] = EMPTY_CODE
+    side = codes.shape[0]
+    for row, col in zip(*np.nonzero(destroyed)):
+        specials.pop(row * side + col, None)
+
+
+def destroy_tiles(board):
+    """
+    Same as tile_destroyer.destroy_tiles.
+    """
+    codes = to_array(board)
+    masks = _class_masks(codes)
+    if masks is None:
+        return None
+    _, destroyed = _destroyed(masks)
+    specials = dict(board.specials)
+    _destroy(codes, specials, destroyed)
+    return (to_board(codes, specials),
+            [(int(row), int(col)) for row, col
+             in zip(*np.nonzero(destroyed))])
+
+
+def _gravity(codes, specials):
+    """
+    Return (new_codes, new_specials, moved), with every column's non-empty
+    tiles compacted to the bottom, keeping their order, and `moved` a list
+    of (old_row, col, new_row) for tiles that fell.
+    """
+    side = codes.shape[0]
+    filled = codes != EMPTY_CODE
+    new_rows = side - filled[::-1].cumsum(axis=0)[::-1]
+    rows, cols = np.nonzero(filled)
+    to_rows = new_rows[filled]
+    new_codes = np.full_like(codes, EMPTY_CODE)
+    new_codes[to_rows, cols] = codes[filled]
+
+    moved = [(int(row), int(col), int(to_row))
+             for row, col, to_row in zip(rows, cols, to_rows)
+             if row != to_row]
+    new_specials = dict(specials)
+    for row, col, to_row in moved:
+        if row * side + col in specials:
+            del new_specials[row * side + col]
+    for row, col, to_row in moved:
+        if row * side + col in specials:
+            new_specials[to_row * side + col] = specials[row * side + col]
+    return new_codes, new_specials, moved
+
+
+def apply_gravity(board):
+    """
+    Same as gravity.apply_gravity.
+    """
+    new_codes, new_specials, moved = _gravity(to_array(board),
+                                              board.specials)
+    return (to_board(new_codes, new_specials),
+            sorted(((row, col), (to_row, col))
+                   for row, col, to_row in moved))
+
+
+def settle_board(board):
+    """
+    Same as board_settler.settle_board.
+    """
+    codes = to_array(board)
+    if _class_masks(codes) is None:
+        return None
+    specials = dict(board.specials)
+    side = board.side
+
+    while True:
+        matched, destroyed = _destroyed(_class_masks(codes))
+        if not matched.any():
+            break
+
+        crits = []
+        # no match can be big enough to create a critical otherwise
+        if matched.sum() >= MIN_CREATE_CRITICAL:
+            for m in match.find_matches(to_board(codes, specials)):
+                crit = calc_critical_square(m)
+                if crit:
+                    crits.append(crit)
+
+        _destroy(codes, specials, destroyed)
+        for row, col in crits:
+            codes[row, col] = CRITICAL_CODE
+            specials.pop(row * side + col, None)
+        codes, specials, _ = _gravity(codes, specials)
+
+    return to_board(codes, specials)
+
+
+_CANDIDATES = dict()
+
+
+def candidate_swaps(side):
+    """
+    Return every ((row, col), (row, col)) swap on a board of side `side`, in
+    the order strategy.find_moves tries them.
+    """
+    if side not in _CANDIDATES:
+        _CANDIDATES[side] = [((row, col), (row_n, col_n))
+                             for row in reversed(range(side))
+                             for col in reversed(range(side))
+                             for row_n, col_n in neighbors(row, col, side)]
+    return _CANDIDATES[side]
+
+
+def swapped_boards(board):
+    """
+    Return an (N, side, side) array holding the board after each of the N
+    `candidate_swaps`.
+    """
+    codes = to_array(board)
+    swaps = np.array(candidate_swaps(board.side), dtype=np.intp)
+    batch = np.repeat(codes[np.newaxis], len(swaps), axis=0)
+    index = np.arange(len(swaps))
+    from_rows, from_cols = swaps[:, 0, 0], swaps[:, 0, 1]
+    to_rows, to_cols = swaps[:, 1, 0], swaps[:, 1, 1]
+    batch[index, from_rows, from_cols] = codes[to_rows, to_cols]
+    batch[index, to_rows, to_cols] = codes[from_rows, from_cols]
+    return batch
+
+
+def legal_swaps(board):
+    """
+    Return the `candidate_swaps` that create at least one match, in the same
+    order, checking all of them in one batched pass.
+
+    Returns None if the board holds tiles we can't classify.
+    """
+    masks = _class_masks(swapped_boards(board))
+    if masks is None:
+        return None
+    legal = _has_windows(masks, -1) | _has_windows(masks, -2)
+    candidates = candidate_swaps(board.side)
+    return [candidates[i] for i in np.nonzero(legal)[0]]
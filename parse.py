@@ -58,15 +58,15 @@ def to_tile(s):
     if len(s) == 1:
         t = s[0]
         if t == '*':
-            return tiles.NullTile()
+            return tiles.NULL
         elif t == 'C':
-            return tiles.CriticalTile()
+            return tiles.CRITICAL
         elif t == 'T':
-            return tiles.TeamupTile()
+            return tiles.TEAMUP
         elif t == 'E':
-            return tiles.EmptyTile()
+            return tiles.EMPTY
         else:
-            return tiles.ColoredTile(color=t)
+            return tiles.colored_tile(t)
     else:
         sub = s[1]
         if sub == 'P':
@@ -7,9 +7,9 @@ from argparse import ArgumentParser
 import random
 
 from aimulator import create_ai_strat
+from board_corpus import board_source
 from game import Game
 from player import Player
-from stable_board import rand_stable_board
 from strategy import create_ap_seeking_strat
 from simulation import stop_after_n_turns
 
@@ -32,10 +32,12 @@ def main():
     parser = ArgumentParser()
     parser.add_argument('--num-turns', type=int, default=50)
     parser.add_argument('--play-defense', action="store_true", default=False)
+    parser.add_argument('--board-corpus')
+    parser.add_argument('--move-time', type=float)
     parser.add_argument('random_seed', type=int)
     args = parser.parse_args()
     random.seed(args.random_seed)
-    board = rand_stable_board()
+    board = board_source(args.board_corpus, start=args.random_seed)()
     defense_colors = ['G', 'Y', 'R', 'BL', 'P', 'T']
     offense_play_colors = ['BK', 'R', 'Y', 'P']
     offense_judged_by_colors = ['BK', 'R', 'Y', 'P']
@@ -47,12 +49,16 @@ def main():
                 offense=offense,
                 defense=defense,
                 pre_move=print_ap,
-                stop_condition=stop_after_n_turns(args.num_turns))
+                stop_condition=stop_after_n_turns(args.num_turns),
+                move_time=args.move_time)
     print "O judged by colors: %s" % ' '.join(offense_judged_by_colors)
     print "O play colors: %s" % ' '.join(offense_play_colors)
     print "D colors: %s" % ' '.join(defense_colors)
     print "---"
     game.play()
+    print "Latency: %s" % ' '.join(['%s=%s' % item
+                                    for item
+                                    in sorted(game.latency_stats().items())])
 
 
 if __name__ == '__main__':
@@ -10,9 +10,9 @@ from argparse import ArgumentParser
 import random
 
 from aimulator import create_ai_strat
+from board_corpus import board_source
 from game import Game
 from player import Player
-from stable_board import rand_stable_board
 from strategy import create_ap_seeking_strat
 
 
@@ -36,10 +36,11 @@ def print_ap(game_state):
 
 def main():
     parser = ArgumentParser()
+    parser.add_argument('--board-corpus')
     parser.add_argument('random_seed', type=int)
     args = parser.parse_args()
     random.seed(args.random_seed)
-    board = rand_stable_board()
+    board = board_source(args.board_corpus, start=args.random_seed)()
     colors = ['G', 'Y', 'R', 'B', 'P', 'T']
     defense_colors = ['G', 'Y', 'R', 'B', 'P', 'T']
     offense = Player(strategy=create_ap_seeking_strat(colors))
@@ -7,15 +7,15 @@ from argparse import ArgumentParser
 import random
 import sys
 
+from board_corpus import board_source
 from game import Game
 from parse import unparse_board
 from player import Player
-from stable_board import rand_stable_board
-from strategy import no_move_strat, rand_move_strat, find_moves
+from strategy import no_move_strat, rand_move_strat, has_any_move
 
 
 def stop_when_stuck(game_state):
-    return not find_moves(game_state.board, stop_after=1)
+    return not has_any_move(game_state.board)
 
 
 def print_board(game_state):
@@ -32,13 +32,15 @@ def main():
     parser.add_argument('--random-seed', type=int)
     parser.add_argument('--print-board',
                         action='store_true')
+    parser.add_argument('--board-corpus')
     args = parser.parse_args()
     if args.random_seed:
         random.seed(args.random_seed)
     pre_move = None
     if args.print_board:
         pre_move = print_board
-    board = rand_stable_board()
+    board = board_source(args.board_corpus,
+                         start=args.random_seed or 0)()
     offense = Player(strategy=rand_move_strat)
     defense = Player(strategy=no_move_strat)
     game = Game(board=board,
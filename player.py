@@ -8,6 +8,8 @@ For the moment, it just holds a move strategy.
 
 from collections import defaultdict
 
+from anytime import takes_deadline
+
 
 class Player(object):
 
@@ -15,7 +17,7 @@ class Player(object):
         self.strategy = strategy
         self.cur_ap = defaultdict(int)
 
-    def pick_move(self, game_state):
+    def pick_move(self, game_state, deadline=None):
         """
         Return a tuple of:
 
@@ -29,7 +31,12 @@ class Player(object):
 
         - `game_state`: a game.GameState namedtuple containing the current
           state of the game.
+
+        - `deadline`: if not None, the time.time() by which to return a move,
+          passed on to strategies that take one (see anytime).
         """
+        if deadline is not None and takes_deadline(self.strategy):
+            return self.strategy(game_state, deadline=deadline)
         return self.strategy(game_state)
 
     def update_destroyed_tile(self, row, col, board, destroyed_by_self):
@@ -0,0 +1,195 @@
+"""
+Score candidate moves across a pool of worker processes.
+
+Strategies that look ahead spend most of their time scoring moves that
+don't depend on each other, so they can hand them to a ScoringPool instead
+of scoring them one by one.  Workers are started once and kept for the life
+of the pool, so what they cache (see board_aware_cache) carries over from
+one decision to the next.
+
+Boards are sent packed: their tile codes as a string, plus any special
+tiles as plain data.  Countdowns go without their on_countdown callbacks,
+which scoring never fires (and which needn't pickle); a board with a
+special tile of some other type is pickled as is, or if it can't be, its
+moves are scored in process.  Scores come back in the same order as the moves,
+so anything ranking them (and breaking ties by move order) gets the same
+answer as scoring them in process.
+"""
+
+from collections import deque
+import cPickle
+from itertools import islice
+import multiprocessing
+import time
+
+from anytime import until
+from board import Board
+from tiles import StrikeTile, AttackTile, ProtectTile, CountdownTile
+
+
+# moves per task when scoring to a deadline: few enough that not much is
+# left running once it passes, enough that each task's board unpacking is
+# shared between several moves
+DEADLINE_CHUNK = 4
+
+# special tiles sent as plain data, and the constructor arguments sent for
+# each
+_PLAIN_ARGS = {
+    StrikeTile: ('color', 'strength', 'direction'),
+    AttackTile: ('color', 'strength', 'direction'),
+    ProtectTile: ('color', 'strength', 'direction'),
+    CountdownTile: ('color', 'turns_left'),
+}
+_PLAIN_TYPES = dict((tile_type.__name__, tile_type)
+                    for tile_type in _PLAIN_ARGS)
+
+
+def pack_board(board):
+    """
+    Return `board` as a tuple of plain data, for sending to another process.
+
+    Raises cPickle.PicklingError (or TypeError) for a special tile that is
+    neither sent as plain data nor picklable.
+    """
+    specials = []
+    for i, tile in sorted(board.specials.items()):
+        args = _PLAIN_ARGS.get(type(tile))
+        if args is None:
+            specials.append((i, None,
+                             cPickle.dumps(tile, cPickle.HIGHEST_PROTOCOL)))
+        else:
+            specials.append((i, type(tile).__name__,
+                             tuple(getattr(tile, arg) for arg in args)))
+    return board.side, str(board.codes), tuple(specials)
+
+
+def unpack_board(packed):
+    """
+    Return the Board packed by pack_board.
+    """
+    side, codes, specials = packed
+    return Board.from_codes(side, codes,
+                            [(i, _unpack_tile(type_name, data))
+                             for i, type_name, data in specials])
+
+
+def _unpack_tile(type_name, data):
+    if type_name is None:
+        return cPickle.loads(data)
+    return _PLAIN_TYPES[type_name](*data)
+
+
+class ScoringPool(object):
+    """
+    A pool of `processes` workers (by default, one per CPU) for scoring
+    moves.
+
+    Close it (or use it as a context manager) when done.
+    """
+
+    def __init__(self, processes=None):
+        self.processes = processes or multiprocessing.cpu_count()
+        self._pool = multiprocessing.Pool(self.processes)
+        # tasks score_until left running at its deadline
+        self._outstanding = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def score(self, scorer, board, moves, *args):
+        """
+        Return [scorer(board, from_sq, to_sq, *args) for each (from_sq,
+        to_sq) in `moves`], worked out across the pool.
+
+        `scorer`, and `args`, must be picklable: a module level function
+        will do.
+        """
+        moves = list(moves)
+        if not moves:
+            return []
+        packed = _pack_or_none(board)
+        if packed is None:
+            return _score_in_process(None, scorer, board, moves, args)
+        self._drain()
+        # one contiguous chunk per worker, so each unpacks the board once
+        size = -(-len(moves) // self.processes)
+        chunks = [(scorer, packed, moves[i:i + size], args)
+                  for i in range(0, len(moves), size)]
+        scores = []
+        for chunk_scores in self._pool.map(_score_chunk, chunks):
+            scores.extend(chunk_scores)
+        return scores
+
+    def score_until(self, deadline, scorer, board, moves, *args):
+        """
+        Same as score, but for only as many of `moves`, from the first, as
+        are scored by `deadline` (see anytime), and at least the first.
+
+        Moves go out a few at a time, with no more tasks queued than there
+        are workers, so little is left running once the deadline passes.
+        What is left finishes in the background, and the next call to score
+        or score_until waits for it before queueing anything, so that call's
+        tasks don't sit behind stale ones.
+        """
+        if deadline is None:
+            return self.score(scorer, board, moves, *args)
+        moves = list(moves)
+        packed = _pack_or_none(board)
+        if packed is None:
+            return _score_in_process(deadline, scorer, board, moves, args)
+        self._drain()
+        chunks = ((scorer, packed, moves[i:i + DEADLINE_CHUNK], args)
+                  for i in range(0, len(moves), DEADLINE_CHUNK))
+        pending = deque(self._pool.apply_async(_score_chunk, (chunk,))
+                        for chunk in islice(chunks, self.processes))
+        scores = []
+        while pending:
+            result = pending.popleft()
+            if scores:
+                timeout = deadline - time.time()
+                if timeout <= 0:
+                    pending.appendleft(result)
+                    break
+                try:
+                    chunk_scores = result.get(timeout)
+                except multiprocessing.TimeoutError:
+                    pending.appendleft(result)
+                    break
+            else:
+                chunk_scores = result.get()
+            scores.extend(chunk_scores)
+            for chunk in islice(chunks, 1):
+                pending.append(self._pool.apply_async(_score_chunk, (chunk,)))
+        self._outstanding = list(pending)
+        return scores
+
+    def close(self):
+        self._pool.close()
+        self._pool.join()
+        self._outstanding = []
+
+    def _drain(self):
+        for result in self._outstanding:
+            result.wait()
+        self._outstanding = []
+
+
+def _pack_or_none(board):
+    try:
+        return pack_board(board)
+    except (cPickle.PicklingError, TypeError):
+        return None
+
+
+def _score_in_process(deadline, scorer, board, moves, args):
+    return [scorer(board, from_sq, to_sq, *args)
+            for from_sq, to_sq in until(deadline, moves)]
+
+
+def _score_chunk(chunk):
+    scorer, packed, moves, args = chunk
+    board = unpack_board(packed)
+    return [scorer(board, from_sq, to_sq, *args) for from_sq, to_sq in moves]
@@ -2,15 +2,15 @@
 Generate a guaranteed stable board (for the beginning of a game).
 """
 
-from parse import unparse_board
+import random
+
+from bitboard import has_swap
 from board import Board
-from constants import BOARD_SIDE
-from match import find_matches_at
-from strategy import find_moves
-from tiles import new_rand_tile, EmptyTile
+from constants import BOARD_SIDE, MIN_MATCH
+from tiles import NEW_TILES, EMPTY
 
 
-# Max times we'll try a random tile in an empty square before declaring a
+# Max boards we'll generate looking for one with a move before declaring a
 # problem
 MAX_TRIES = 100
 
@@ -22,32 +22,55 @@ def rand_stable_board(board_side=BOARD_SIDE, no_teamups=False):
 
     The board will have at least one legal move.
 
-    Throws an exception if it can't randomly and stably fill a given square in
-    MAX_TRIES tries, or can't generate a board with at least one move after
-    MAX_TRIES tries.
+    Squares are filled from the bottom right, each with a tile chosen
+    uniformly from those (colors, and teamups unless `no_teamups`) that
+    wouldn't complete a run with the tiles already placed below it or to its
+    right.  That's the same distribution as drawing random tiles until one
+    doesn't match, but each square takes exactly one draw.  Boards without a
+    move are thrown away, which happens very rarely on full size boards.
+
+    Throws an exception if it can't generate a board with at least one move
+    after MAX_TRIES tries.
     """
-    board_tries = 0
-    while True:
-        board_tries += 1
-        if board_tries >= MAX_TRIES:
-            raise Exception(
-                "No moves on stable board after %d tries" % MAX_TRIES)
-
-        board = empty_board(board_side)
-        for (row, col) in board.squares_from_bottom_right():
-            sq_tries = 0
-            while True:
-                sq_tries += 1
-                if sq_tries >= MAX_TRIES:
-                    raise Exception(
-                        "Unstable cell (%d, %d) after %d tries %s" %
-                        (row, col, MAX_TRIES, unparse_board(board)))
-                board.set_at(row, col, new_rand_tile(no_teamups=no_teamups))
-
-                if not find_matches_at(row, col, board):
-                    break
-        if find_moves(board, stop_after=1):
+    tiles = [tile for tile in NEW_TILES
+             if not (no_teamups and tile.is_teamup())]
+    for _ in range(MAX_TRIES):
+        board = Board(_stable_rows(board_side, tiles))
+        if has_swap(board):
             return board
+    raise Exception("No moves on stable board after %d tries" % MAX_TRIES)
+
+
+def _stable_rows(board_side, tiles):
+    """
+    Return rows of tiles chosen from `tiles` with no runs in them.
+
+    Since the squares above and to the left of a square are still empty
+    when it's filled, the only runs it could complete are with the
+    MIN_MATCH - 1 tiles straight below it, or straight to its right.
+    """
+    reach = MIN_MATCH - 1
+    rows = [[None] * board_side for _ in range(board_side)]
+    for row in reversed(range(board_side)):
+        below = rows[row + 1:row + 1 + reach]
+        for col in reversed(range(board_side)):
+            banned = []
+            right = rows[row][col + 1:col + 1 + reach]
+            if len(right) == reach and _all_same(right):
+                banned.append(right[0])
+            col_below = [r[col] for r in below]
+            if len(col_below) == reach and _all_same(col_below):
+                banned.append(col_below[0])
+            if banned:
+                rows[row][col] = random.choice(
+                    [tile for tile in tiles if tile not in banned])
+            else:
+                rows[row][col] = random.choice(tiles)
+    return rows
+
+
+def _all_same(tiles):
+    return all(tile == tiles[0] for tile in tiles)
 
 
 def empty_board(board_side):
@@ -59,7 +82,7 @@ def empty_board(board_side):
     for _rows in range(board_side):
         row = []
         for _cols in range(board_side):
-            row.append(EmptyTile())
+            row.append(EMPTY)
         rows.append(row)
 
     return Board(rows)
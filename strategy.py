@@ -6,15 +6,15 @@ from collections import namedtuple
 import itertools
 import random
 
+from anytime import anytime, until
+import bitboard
 from board import neighbors
-from board_settler import settle_board
 import board_aware_cache
-from criticals import calc_critical_square
-from gravity import apply_gravity
-from match import find_matches
+from expected_ap import expected_aps
+from match import find_matches, _find_new_matches
+from move_outcome import move_outcome
+import numpy_backend
 from square import sq
-from tile_destroyer import destroy_tiles
-from tiles import CriticalTile
 
 
 MoveWithMatches = namedtuple('MoveWithMatches',
@@ -25,7 +25,7 @@ MoveWithMatches = namedtuple('MoveWithMatches',
                              ''')
 
 
-def find_moves(board, stop_after=None):
+def find_moves(board, stop_after=None, both_directions=True):
     """
     Return all legal swap moves on the board as a sorted list of
     MoveWithMatches.
@@ -35,35 +35,118 @@ def find_moves(board, stop_after=None):
     being the 'touched' tile (by convention, that being the first listed in the
     tuple).  This is not always the case if passing `stop_after.`
 
+    If `both_directions` is False, each swap is listed only once, with the
+    smaller square first.  Either way, each swap is only tried once.
+
     If `stop_after` is supplied, stop after that many moves are found.
     """
-    cached = board_aware_cache.get('find_moves', board, stop_after)
-    if cached:
+    key = (stop_after, both_directions)
+    cached = board_aware_cache.get('find_moves', board, key)
+    if cached is not None:
         return cached
 
     moves_with_matches = []
-
-    for (row, col) in board.squares_from_bottom_right():
-        for row_n, col_n in neighbors(row, col, board.side):
-            nb = board.copy()
-            nb.swap(row, col, row_n, col_n)
-            matches = find_matches(nb)
+    # the matches made by each swap tried, keyed with the smaller square
+    # first, since both directions leave the same board
+    matches_by_swap = dict()
+
+    # on a stable board, any match after a swap has to go through one of the
+    # swapped squares, so only their rows and cols need checking
+    stable = not find_matches(board, stop_after=1)
+
+    # try each swap in place, rolling it back afterwards, rather than
+    # copying the board for every candidate
+    mark = board.checkpoint()
+    try:
+        for swap in _candidate_swaps(board, stable):
+            swap_key = min(swap), max(swap)
+            if swap_key in matches_by_swap:
+                if not both_directions:
+                    continue
+                matches = matches_by_swap[swap_key]
+            else:
+                (row, col), (row_n, col_n) = swap
+                board.swap(row, col, row_n, col_n)
+                if stable:
+                    matches = _find_new_matches(board, [(row, col),
+                                                        (row_n, col_n)])
+                else:
+                    matches = find_matches(board)
+                board.rollback(mark)
+                matches_by_swap[swap_key] = matches
             if matches:
+                if both_directions:
+                    from_sq, to_sq = swap
+                else:
+                    from_sq, to_sq = swap_key
                 moves_with_matches.append(
-                    MoveWithMatches(from_sq=sq(row, col),
-                                    to_sq=sq(row_n, col_n),
+                    MoveWithMatches(from_sq=sq(*from_sq),
+                                    to_sq=sq(*to_sq),
                                     matches=matches))
                 if stop_after and len(moves_with_matches) >= stop_after:
                     sorted_moves_with_matches = sorted(moves_with_matches)
-                    board_aware_cache.set('find_moves', board, stop_after,
+                    board_aware_cache.set('find_moves', board, key,
                                           sorted_moves_with_matches)
                     return sorted_moves_with_matches
+    finally:
+        board.rollback(mark)
+        board.commit()
 
     sorted_moves_with_matches = sorted(moves_with_matches)
-    board_aware_cache.set('find_moves', board, None, sorted_moves_with_matches)
+    board_aware_cache.set('find_moves', board, (None, both_directions),
+                          sorted_moves_with_matches)
+    if stop_after is not None:
+        # fewer than stop_after, so this is the answer for stop_after too
+        board_aware_cache.set('find_moves', board, key,
+                              sorted_moves_with_matches)
     return sorted_moves_with_matches
 
 
+def has_any_move(board):
+    """
+    Return whether `board` has any legal swap move.
+
+    Same as bool(find_moves(board, stop_after=1)), but on a stable board
+    the moves' matches aren't worked out.
+    """
+    if not find_matches(board, stop_after=1):
+        has_swap = bitboard.has_swap(board)
+        if has_swap is not None:
+            return has_swap
+    return bool(find_moves(board, stop_after=1))
+
+
+def _candidate_swaps(board, stable):
+    """
+    Generate the ((row, col), (row, col)) swaps worth trying on `board`, in
+    the same order whichever way they're found.
+
+    On a `stable` board, swaps are found by matching templates, and with the
+    NumPy backend on, all swaps are screened in one batched pass, so only
+    those that make a match are generated.
+    """
+    if stable:
+        legal = bitboard.find_swaps(board)
+        if legal is not None:
+            for (row, col) in board.squares_from_bottom_right():
+                for row_n, col_n in neighbors(row, col, board.side):
+                    if (min((row, col), (row_n, col_n)),
+                            max((row, col), (row_n, col_n))) in legal:
+                        yield (row, col), (row_n, col_n)
+            return
+
+    if numpy_backend.enabled():
+        legal = numpy_backend.legal_swaps(board)
+        if legal is not None:
+            for swap in legal:
+                yield swap
+            return
+
+    for (row, col) in board.squares_from_bottom_right():
+        for row_n, col_n in neighbors(row, col, board.side):
+            yield (row, col), (row_n, col_n)
+
+
 def rand_move_strat(game_state):
     """
     Pick a random available move.
@@ -89,42 +172,48 @@ def first_move_strat(game_state):
     return (move_with_match.from_sq, move_with_match.to_sq)
 
 
-def create_protect_protects_strat(direction):
+def create_protect_protects_strat(direction, pool=None):
     """
     Create a strat that minimizes the number of protection in `direction` lost.
 
     Ties are broken randomly.
-    """
-
-    def protect_protects_strat(game_state):
-        moves_with_matches = find_moves(game_state.board)
-        protection_with_moves = []
-
-        seen_moves = set()
-
-        for move_with_matches in moves_with_matches:
-            from_sq = move_with_matches.from_sq
-            to_sq = move_with_matches.to_sq
 
-            directionless_move = frozenset([from_sq, to_sq])
-            if directionless_move in seen_moves:
-                continue
-            seen_moves.add(directionless_move)
+    If `pool` (a scoring_pool.ScoringPool) is given, moves are scored across
+    it.
 
-            board = game_state.board.copy()
-            board.swap(from_sq[0], from_sq[1], to_sq[0], to_sq[1])
-            board = settle_board(board)
-            protection_with_moves.append((board.protection,
-                                          (from_sq, to_sq)))
+    Given a `deadline` (see anytime), moves making the fewest tiles of
+    matches are scored first, and the best of those scored by the deadline
+    is picked, whether scored here or across `pool`.
+    """
 
-        max_protection = 0
-        if protection_with_moves:
-            max_protection = max(p[0] for p in protection_with_moves)
+    @anytime
+    def protect_protects_strat(game_state, deadline=None):
+        moves_with_matches = find_moves(game_state.board,
+                                        both_directions=False)
+        if deadline is not None:
+            moves_with_matches = sorted(moves_with_matches,
+                                        key=_tiles_matched)
+        moves = [(mwm.from_sq, mwm.to_sq) for mwm in moves_with_matches]
+        if pool is not None:
+            losts = pool.score_until(deadline, _protection_lost,
+                                     game_state.board, moves, direction)
+        else:
+            losts = [move_outcome(game_state.board,
+                                  mwm.from_sq,
+                                  mwm.to_sq,
+                                  mwm.matches).protection_lost(direction)
+                     for mwm in until(deadline, moves_with_matches)]
+        lost_with_moves = zip(losts, moves)
+
+        if not lost_with_moves:
+            return None
+
+        min_lost = min(p[0] for p in lost_with_moves)
 
         return random.choice([p[1]
                               for p
-                              in protection_with_moves
-                              if p[0] == max_protection])
+                              in lost_with_moves
+                              if p[0] == min_lost])
 
     return protect_protects_strat
 
@@ -141,29 +230,23 @@ def _ap(from_sq, to_sq, matches, colors, board):
     Return a list, the same length as `colors`, with each element being the
     number of ap in that color earned by `match`.
     """
-    ap = [0] * len(colors)
+    ap = move_outcome(board, from_sq, to_sq, matches).ap
+    return [ap.get(color, 0) for color in colors]
+
+
+def _move_ap(board, from_sq, to_sq, colors):
+    return _ap(from_sq, to_sq, None, colors, board)
 
-    # later, do prob. ev of tiles that fall
 
-    board = board.copy()
-    board.swap(from_sq[0], from_sq[1], to_sq[0], to_sq[1])
+def _protection_lost(board, from_sq, to_sq, direction):
+    return move_outcome(board, from_sq, to_sq).protection_lost(direction)
 
-    while find_matches(board):
-        new_board, destroyed_sqs = destroy_tiles(board)
-        for s in destroyed_sqs:
-            sq_ap = board.at(s[0], s[1]).ap()
-            if sq_ap and sq_ap[0] in colors:
-                ap[colors.index(sq_ap[0])] += sq_ap[1]
-        for match in matches:
-            crit = calc_critical_square(match)
-            if crit:
-                new_board.set_at(crit[0], crit[1], CriticalTile())
-        board, _ = apply_gravity(new_board)
 
-    return ap
+def _tiles_matched(mwm):
+    return sum(m.tile_count for m in mwm.matches)
 
 
-def create_ap_seeking_strat(colors):
+def create_ap_seeking_strat(colors, refill_samples=None, pool=None):
     """
     Return a strategy that seeks AP in `colors`, preferring those earlier in
     `colors` to those later.
@@ -172,19 +255,48 @@ def create_ap_seeking_strat(colors):
     color, breaking any ties with reference to the next most preferred etc.
 
     Ties are broken with reference to the lexically earliest swapped tiles.
+
+    If `refill_samples` is given, AP is the expected AP over up to that many
+    samples of the tiles that fall in after the move (see expected_ap),
+    rather than only what the tiles on the board earn.
+
+    Otherwise, if `pool` (a scoring_pool.ScoringPool) is given, moves are
+    scored across it.
+
+    Given a `deadline` (see anytime), moves making the most tiles of matches
+    are scored first (sampled, here or across `pool`), and the best of those
+    scored by the deadline is picked.
     """
     colors = list(colors)
 
-    def _ap_seeking_strat(game_state):
-        moves_with_matches = find_moves(game_state.board)
-        ap_plus_move = [(_ap(mwm.to_sq,
-                             mwm.from_sq,
-                             mwm.matches,
-                             colors,
-                             game_state.board),
-                         (mwm.to_sq, mwm.from_sq))
-                        for mwm
-                        in moves_with_matches]
+    @anytime
+    def _ap_seeking_strat(game_state, deadline=None):
+        # both directions of a swap earn the same AP, and the earlier square
+        # first is the lexically earlier of the two
+        moves_with_matches = find_moves(game_state.board,
+                                        both_directions=False)
+        if deadline is not None:
+            moves_with_matches = sorted(moves_with_matches,
+                                        key=_tiles_matched, reverse=True)
+        if refill_samples:
+            aps = expected_aps(game_state.board, moves_with_matches, colors,
+                               samples=refill_samples, deadline=deadline)
+        elif pool is not None:
+            aps = pool.score_until(deadline, _move_ap, game_state.board,
+                                   [(mwm.from_sq, mwm.to_sq)
+                                    for mwm in moves_with_matches],
+                                   colors)
+        else:
+            aps = [_ap(mwm.from_sq,
+                       mwm.to_sq,
+                       mwm.matches,
+                       colors,
+                       game_state.board)
+                   for mwm
+                   in until(deadline, moves_with_matches)]
+        ap_plus_move = [(ap, (mwm.from_sq, mwm.to_sq))
+                        for ap, mwm
+                        in zip(aps, moves_with_matches)]
         ap_plus_move.sort(reverse=True)
         for _, moves in itertools.groupby(ap_plus_move, lambda t: t[0]):
             return sorted(moves)[0][1]
@@ -0,0 +1,39 @@
+import time
+
+from nose.tools import eq_, ok_
+
+from anytime import anytime, takes_deadline, until
+from player import Player
+
+
+def test_until_no_deadline():
+    eq_([1, 2, 3], list(until(None, [1, 2, 3])))
+
+
+def test_until_passed_deadline():
+    eq_([1], list(until(time.time() - 1, [1, 2, 3])))
+
+
+def test_until_future_deadline():
+    eq_([1, 2, 3], list(until(time.time() + 60, [1, 2, 3])))
+
+
+def test_takes_deadline():
+    ok_(not takes_deadline(lambda game_state: None))
+    ok_(takes_deadline(anytime(lambda game_state, deadline=None: None)))
+
+
+def test_player_passes_deadline():
+    @anytime
+    def _strat(game_state, deadline=None):
+        return deadline
+
+    eq_(None, Player(_strat).pick_move(None))
+    eq_(5, Player(_strat).pick_move(None, deadline=5))
+
+
+def test_player_holds_deadline_back():
+    def _strat(game_state):
+        return 'moved'
+
+    eq_('moved', Player(_strat).pick_move(None, deadline=5))
@@ -0,0 +1,111 @@
+import random
+
+from nose.tools import eq_
+
+from bitboard import find_runs, find_runs_at, find_runs_through, \
+    find_swaps, has_swap
+from board import Board, neighbors
+from match import Match, find_left_match_at, find_right_match_at, \
+    find_up_match_at, find_down_match_at
+from tiles import ColoredTile, CriticalTile, TeamupTile, EmptyTile, \
+    ProtectTile
+from tutils import rand_stable_board_with_criticals
+
+
+# few colors and plenty of criticals, so random boards are full of matches
+TILE_FUNCS = [lambda: ColoredTile('Y'),
+              lambda: ColoredTile('R'),
+              lambda: ProtectTile('Y', 3, '<'),
+              CriticalTile,
+              TeamupTile,
+              EmptyTile]
+
+DIRECTIONAL_FINDS = [find_left_match_at,
+                     find_right_match_at,
+                     find_up_match_at,
+                     find_down_match_at]
+
+
+def _rand_board(side):
+    return Board([[random.choice(TILE_FUNCS)() for _ in range(side)]
+                  for _ in range(side)])
+
+
+def _walked_matches_at(row, col, board):
+    matches = [find(row, col, board) for find in DIRECTIONAL_FINDS]
+    return sorted([m for m in matches if m])
+
+
+def test_find_runs_matches_walking():
+    for side in [3, 4, 5, 8]:
+        for _ in range(25):
+            yield _verify_find_runs_matches_walking, _rand_board(side)
+
+
+def _verify_find_runs_matches_walking(board):
+    expected = set()
+    for row, col in board.squares_from_bottom_right():
+        expected.update(_walked_matches_at(row, col, board))
+    eq_(sorted(expected), sorted(set(Match(r) for r in find_runs(board))))
+
+
+def test_find_runs_at_matches_walking():
+    for side in [3, 4, 5, 8]:
+        for _ in range(5):
+            yield _verify_find_runs_at_matches_walking, _rand_board(side)
+
+
+def _verify_find_runs_at_matches_walking(board):
+    for row, col in board.squares_from_bottom_right():
+        eq_(_walked_matches_at(row, col, board),
+            sorted([Match(r) for r in find_runs_at(row, col, board)]))
+
+
+def test_find_runs_through():
+    for side in [3, 4, 5, 8]:
+        for _ in range(10):
+            board = _rand_board(side)
+            squares = [(random.randrange(side), random.randrange(side))
+                       for _ in range(random.randint(1, 2))]
+            yield _verify_find_runs_through, board, squares
+
+
+def _verify_find_runs_through(board, squares):
+    rows = set(row for row, _ in squares)
+    cols = set(col for _, col in squares)
+
+    def _in_lines(run):
+        run_rows = set(row for row, _ in run)
+        run_cols = set(col for _, col in run)
+        return ((len(run_rows) == 1 and run_rows <= rows) or
+                (len(run_cols) == 1 and run_cols <= cols))
+
+    eq_(set(r for r in find_runs(board) if _in_lines(r)),
+        find_runs_through(board, squares))
+
+
+def test_find_swaps():
+    for side in [4, 5, 8]:
+        for _ in range(10):
+            yield _verify_find_swaps, rand_stable_board_with_criticals(side)
+
+
+def _verify_find_swaps(board):
+    expected = set()
+    for row, col in board.squares_from_bottom_right():
+        for row_n, col_n in neighbors(row, col, board.side):
+            swapped = board.copy()
+            swapped.swap(row, col, row_n, col_n)
+            if find_runs(swapped):
+                expected.add(tuple(sorted([(row, col), (row_n, col_n)])))
+    eq_(expected, find_swaps(board))
+    eq_(bool(expected), has_swap(board))
+
+
+def test_unknown_tiles():
+    board = Board([['A', 'B', 'C'], ['D', 'E', 'F'], ['G', 'H', 'I']])
+    eq_(None, find_runs(board))
+    eq_(None, find_runs_at(0, 0, board))
+    eq_(None, find_runs_through(board, [(0, 0)]))
+    eq_(None, find_swaps(board))
+    eq_(None, has_swap(board))
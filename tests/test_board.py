@@ -2,6 +2,8 @@ from nose.tools import eq_, ok_
 
 from board import Board, neighbors
 from stable_board import empty_board
+from tiles import ColoredTile, ProtectTile, CountdownTile
+from tutils import random_midgame_board
 
 
 def test_is_in_bounds():
@@ -71,6 +73,31 @@ def test_copy_isolates_changes():
     eq_('B', board.at(0, 1).data)
 
 
+def test_copy_isolates_special_tiles():
+    board = Board([[CountdownTile('Y', 5), ColoredTile('R')],
+                   [ColoredTile('G'), ProtectTile('Y', 3, '<')]])
+    new_board = board.copy()
+    eq_(board, new_board)
+    new_board.at(0, 0).turns_left = 4
+    eq_(5, board.at(0, 0).turns_left)
+    new_board.set_at(1, 1, ColoredTile('Y'))
+    eq_(3, board.protection('<'))
+    eq_(0, new_board.protection('<'))
+    ok_(board != new_board)
+
+
+def test_round_trips_tiles():
+    for _ in range(10):
+        yield _verify_round_trips_tiles, random_midgame_board()
+
+
+def _verify_round_trips_tiles(board):
+    new_board = Board(board.rows)
+    eq_(board, new_board)
+    eq_(str(board), str(new_board))
+    eq_(board.hash(), new_board.hash())
+
+
 def test_squares_from_bottom_right():
     board = Board([[0, 1], [2, 3]])
     eq_([3, 2, 1, 0],
@@ -83,6 +110,19 @@ def test_swap():
     eq_(Board([[2, 1], [0, 3]]), board)
 
 
+def test_swap_special_tiles():
+    protect = ProtectTile('Y', 3, '<')
+    board = Board([[protect, ColoredTile('R')],
+                   [ColoredTile('G'), ColoredTile('P')]])
+    board.swap(0, 0, 0, 1)
+    eq_('R', str(board.at(0, 0)))
+    ok_(protect is board.at(0, 1))
+    board.swap(0, 1, 1, 1)
+    eq_('P', str(board.at(0, 1)))
+    ok_(protect is board.at(1, 1))
+    eq_(3, board.protection('<'))
+
+
 def test_neighbors():
     # (row, col, side, exp_neighbors)
     cases = [
@@ -105,3 +145,65 @@ def test_neighbors():
 
 def _verify_neighbors(row, col, side, expected):
     eq_(sorted(expected), neighbors(row, col, side))
+
+
+def test_hash_tracks_changes():
+    for _ in range(10):
+        yield _verify_hash_tracks_changes, random_midgame_board()
+
+
+def _verify_hash_tracks_changes(board):
+    orig_hash = board.hash()
+    changed = board.copy()
+    eq_(orig_hash, changed.hash())
+    changed.swap(0, 0, 3, 5)
+    changed.set_at(2, 2, ColoredTile('R'))
+    changed.set_at(4, 1, ProtectTile('Y', 7, '<'))
+    changed.swap(4, 1, 4, 2)
+    eq_(Board(changed.rows).hash(), changed.hash())
+    changed.set_at(4, 2, board.at(4, 2))
+    changed.set_at(4, 1, board.at(4, 1))
+    changed.set_at(2, 2, board.at(2, 2))
+    changed.swap(0, 0, 3, 5)
+    eq_(orig_hash, changed.hash())
+
+
+def test_hash_distinguishes_special_tiles():
+    board = Board([[ProtectTile('Y', 3, '<'), ColoredTile('R')],
+                   [ColoredTile('G'), ColoredTile('P')]])
+    other = board.copy()
+    other.set_at(0, 0, ProtectTile('Y', 4, '<'))
+    ok_(board.hash() != other.hash())
+    other.set_at(0, 0, ColoredTile('Y'))
+    ok_(board.hash() != other.hash())
+
+
+def test_rollback():
+    board = random_midgame_board()
+    board.set_at(0, 0, ColoredTile('Y'))
+    board.set_at(0, 1, ColoredTile('R'))
+    orig = board.copy()
+    orig_hash = board.hash()
+
+    outer = board.checkpoint()
+    board.swap(0, 0, 0, 1)
+    board.set_at(3, 3, ProtectTile('Y', 7, '<'))
+
+    inner = board.checkpoint()
+    board.swap(3, 3, 4, 3)
+    board.set_at(5, 5, ColoredTile('G'))
+    board.rollback(inner)
+    board.commit()
+    eq_('Y P < 7', str(board.at(3, 3)))
+
+    board.rollback(outer)
+    board.commit()
+    eq_(str(orig), str(board))
+    eq_(orig_hash, board.hash())
+
+    # no longer logging
+    board.swap(0, 0, 0, 1)
+    board.checkpoint()
+    board.rollback(0)
+    board.commit()
+    ok_(orig_hash != board.hash())
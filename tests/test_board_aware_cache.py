@@ -0,0 +1,77 @@
+from nose.tools import eq_, ok_
+
+import board_aware_cache
+from board_aware_cache import BoundedCache, LRU, FIFO
+from match import find_matches
+from stable_board import rand_stable_board
+
+
+def test_lru_evicts_least_recently_used():
+    cache = BoundedCache(max_entries=2, policy=LRU)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    eq_(1, cache.get('a'))
+    cache.set('c', 3)
+    eq_(None, cache.get('b'))
+    eq_(1, cache.get('a'))
+    eq_(3, cache.get('c'))
+    eq_(dict(hits=3, misses=1, evictions=1, entries=2, bytes=0),
+        cache.stats())
+
+
+def test_fifo_evicts_oldest():
+    cache = BoundedCache(max_entries=2, policy=FIFO)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    eq_(1, cache.get('a'))
+    cache.set('c', 3)
+    eq_(None, cache.get('a'))
+    eq_(2, cache.get('b'))
+
+
+def test_byte_budget():
+    cache = BoundedCache(max_entries=None, max_bytes=10,
+                         sizer=lambda v: len(v))
+    cache.set('a', 'x' * 4)
+    cache.set('b', 'x' * 4)
+    eq_(2, len(cache))
+    cache.set('c', 'x' * 4)
+    eq_(2, len(cache))
+    eq_(8, cache.stats()['bytes'])
+    eq_(None, cache.get('a'))
+    cache.set('b', 'x')
+    eq_(5, cache.stats()['bytes'])
+
+
+def test_caches_empty_results():
+    for cache in [BoundedCache(), BoundedCache(policy=FIFO)]:
+        cache.set('a', [])
+        eq_([], cache.get('a'))
+        eq_(1, cache.stats()['hits'])
+
+
+def test_namespaces():
+    board = rand_stable_board()
+    board_aware_cache.configure(max_entries=5)
+    board_aware_cache.configure(operation='find_moves', max_entries=1)
+    try:
+        eq_([], find_matches(board))
+        eq_([], find_matches(board))
+        eq_(dict(hits=1, misses=1, evictions=0, entries=1),
+            _without_bytes(board_aware_cache.stats()['find_matches']))
+
+        board_aware_cache.set('find_moves', board, 'x', 1)
+        board_aware_cache.set('find_moves', board, 'y', 2)
+        eq_(1, board_aware_cache.stats()['find_moves']['evictions'])
+        eq_(1, board_aware_cache.stats()['find_matches']['entries'])
+
+        board_aware_cache.clear()
+        eq_(None, board_aware_cache.get('find_moves', board, 'y'))
+        ok_(all(s['entries'] == 0
+                for s in board_aware_cache.stats().values()))
+    finally:
+        board_aware_cache.configure()
+
+
+def _without_bytes(stats):
+    return dict((k, v) for k, v in stats.items() if k != 'bytes')
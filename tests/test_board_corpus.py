@@ -0,0 +1,111 @@
+import os
+import shutil
+import tempfile
+
+from nose.tools import eq_, ok_, raises
+
+from board import Board
+from board_corpus import write_corpus, BoardCorpus, board_source
+from match import find_matches
+from strategy import has_any_move
+
+
+_DIR = None
+
+
+def setup_module():
+    global _DIR
+    _DIR = tempfile.mkdtemp()
+
+
+def teardown_module():
+    shutil.rmtree(_DIR)
+
+
+def _path(name):
+    return os.path.join(_DIR, name)
+
+
+def test_round_trip():
+    for side in [4, 6, 8]:
+        yield _verify_round_trip, side
+
+
+def _verify_round_trip(side):
+    path = _path('round_trip_%d' % side)
+    write_corpus(path, 1234, 5, side=side)
+    corpus = BoardCorpus(path)
+    eq_(5, len(corpus))
+    eq_(side, corpus.side)
+    eq_(1234, corpus.seed)
+    ok_(not corpus.no_teamups)
+    for i in range(len(corpus)):
+        board = corpus[i]
+        eq_(side, board.side)
+        eq_([], find_matches(board))
+        ok_(has_any_move(board))
+        # same board, and same hash, as building it tile by tile
+        rebuilt = Board(board.rows)
+        eq_(rebuilt, board)
+        eq_(rebuilt.hash(), board.hash())
+    corpus.close()
+
+
+def test_same_seed_same_boards():
+    write_corpus(_path('seed_a'), 99, 3)
+    write_corpus(_path('seed_b'), 99, 3)
+    eq_(open(_path('seed_a'), 'rb').read(),
+        open(_path('seed_b'), 'rb').read())
+
+
+@raises(Exception)
+def test_bad_board_num():
+    write_corpus(_path('bad_num'), 1, 2)
+    BoardCorpus(_path('bad_num')).board(2)
+
+
+@raises(Exception)
+def test_truncated():
+    path = _path('truncated')
+    write_corpus(path, 1, 2)
+    with open(path, 'r+b') as f:
+        f.truncate(os.path.getsize(path) - 1)
+    BoardCorpus(path)
+
+
+def test_board_source_wraps():
+    path = _path('wraps')
+    write_corpus(path, 7, 3)
+    corpus = BoardCorpus(path)
+    next_board = board_source(path, start=5)
+    eq_([corpus[2], corpus[0], corpus[1], corpus[2]],
+        [next_board() for _ in range(4)])
+
+
+def test_board_source_no_teamups():
+    path = _path('no_teamups')
+    write_corpus(path, 7, 3, no_teamups=True)
+    next_board = board_source(path, no_teamups=True)
+    for _ in range(3):
+        ok_(not any(tile.is_teamup() for tile in next_board()))
+
+
+@raises(Exception)
+def test_board_source_needs_no_teamups_corpus():
+    path = _path('teamups')
+    write_corpus(path, 7, 3)
+    board_source(path, no_teamups=True)
+
+
+@raises(ValueError)
+def test_board_source_checks_side():
+    path = _path('side')
+    write_corpus(path, 7, 3, side=6)
+    board_source(path)
+
+
+def test_board_source_side():
+    path = _path('side_6')
+    write_corpus(path, 7, 3, side=6)
+    eq_(6, board_source(path, side=6)().side)
+    eq_(6, board_source(side=6)().side)
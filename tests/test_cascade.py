@@ -0,0 +1,199 @@
+import re
+from textwrap import dedent
+
+from nose.tools import eq_, ok_
+
+from cascade import ap_by_color, resolve_cascade
+from match import find_matches
+from parse import create_board_parser, parse_board, unparse_board
+from tiles import colored_tile, EMPTY
+from tutils import down_match, right_match
+
+
+FOUR_SIDE_PARSER = create_board_parser(side=4)
+
+FIVE_SIDE_PARSER = create_board_parser(side=5)
+
+
+def _board(board_s, parser):
+    return parse_board(board_s, parser)
+
+
+def _board_s(board):
+    return re.sub('\s', '', unparse_board(board))
+
+
+def test_single_level():
+    board = _board(dedent("""\
+                          | Y | R | BL | P |
+                          | Y | G | BL | R |
+                          | G | G | BK | G |
+                          | Y | G | BL | P |
+                          """),
+                   FOUR_SIDE_PARSER)
+    orig_s = _board_s(board)
+
+    cascade = resolve_cascade(board)
+
+    eq_(orig_s, _board_s(board))
+    eq_(re.sub('\s', '', dedent("""\
+                                | Y | E | BL | P |
+                                | Y | E | BL | R |
+                                | G | E | BK | G |
+                                | Y | R | BL | P |
+                                """)),
+        _board_s(cascade.board))
+    eq_(1, len(cascade.levels))
+    level = cascade.levels[0]
+    eq_([down_match(3)(1, 1)], level.matches)
+    eq_([((row, 1), colored_tile('G')) for row in range(1, 4)],
+        level.destroyed)
+    eq_([], level.crits)
+    eq_([((0, 1), (3, 1))], level.moved)
+    eq_([], level.filled)
+    ok_(not cascade.matched_five)
+
+
+def test_five_match():
+    board = _board(dedent("""\
+                          | R | G | R | G | R |
+                          | G | R | G | R | G |
+                          | R | G | R | G | R |
+                          | P | BK | BL | G | P |
+                          | Y | Y  | Y  | Y | Y |
+                          """),
+                   FIVE_SIDE_PARSER)
+
+    cascade = resolve_cascade(board)
+
+    ok_(cascade.matched_five)
+    level = cascade.levels[0]
+    eq_([right_match(5)(4, 0)], level.matches)
+    eq_([(4, 2)], level.crits)
+
+
+def test_straight_crits_only():
+    board_s = dedent("""\
+                     | R | G | R | G | R |
+                     | G | R | G | R | G |
+                     | Y | Y | Y | G | R |
+                     | Y | R | G | R | G |
+                     | Y | G | R | G | R |
+                     """)
+
+    # the L makes a critical at its corner...
+    level = resolve_cascade(_board(board_s, FIVE_SIDE_PARSER)).levels[0]
+    eq_([(2, 0)], level.crits)
+
+    # ...but the game only makes them from straight fives
+    level = resolve_cascade(_board(board_s, FIVE_SIDE_PARSER),
+                            straight_crits_only=True).levels[0]
+    eq_([], level.crits)
+
+
+def test_on_destroy():
+    board = _board(dedent("""\
+                          | Y | R | BL | P |
+                          | Y | G | BL | R |
+                          | G | G | BK | G |
+                          | Y | G | BL | P |
+                          """),
+                   FOUR_SIDE_PARSER)
+    calls = []
+
+    def on_destroy(board, squares):
+        calls.append([(square, board.at(*square)) for square in squares])
+
+    cascade = resolve_cascade(board, on_destroy=on_destroy)
+
+    eq_([level.destroyed for level in cascade.levels], calls)
+
+
+def test_ap_by_color():
+    board = _board(dedent("""\
+                          | Y | R | BL | P |
+                          | Y | G | BL | R |
+                          | G | G | BK | G |
+                          | Y | G | BL | P |
+                          """),
+                   FOUR_SIDE_PARSER)
+    levels = resolve_cascade(board).levels
+
+    eq_({'G': 3}, ap_by_color(levels))
+    eq_({'G': 3}, ap_by_color(levels, ['G', 'Y']))
+    eq_({}, ap_by_color(levels, ['Y']))
+
+
+def test_refill():
+    board = _board(dedent("""\
+                          | Y | R | BL | P |
+                          | Y | G | BL | R |
+                          | G | G | BK | G |
+                          | Y | G | BL | P |
+                          """),
+                   FOUR_SIDE_PARSER)
+    tiles = [colored_tile('P'), colored_tile('BK'), colored_tile('Y')]
+
+    cascade = resolve_cascade(board, refill=lambda: tiles.pop(0),
+                              in_place=True)
+
+    ok_(cascade.board is board)
+    eq_([((2, 1), colored_tile('P')),
+         ((1, 1), colored_tile('BK')),
+         ((0, 1), colored_tile('Y'))],
+        cascade.levels[0].filled)
+    eq_([], find_matches(board))
+    ok_(all(board.at(row, col) != EMPTY
+            for row, col in board.squares_from_bottom_right()))
+
+
+def test_cascading_levels():
+    # the Rs falling into col 1 make a second match along the bottom row
+    board = _board(dedent("""\
+                          | Y | BL | P  | BK |
+                          | R | Y  | BL | P  |
+                          | P | Y  | BK | BL |
+                          | R | Y  | R  | R  |
+                          """),
+                   FOUR_SIDE_PARSER)
+    board.set_at(0, 1, colored_tile('R'))
+
+    cascade = resolve_cascade(board)
+
+    eq_(2, len(cascade.levels))
+    eq_([down_match(3)(1, 1)], cascade.levels[0].matches)
+    eq_([right_match(4)(3, 0)], cascade.levels[1].matches)
+    eq_([], find_matches(cascade.board))
+
+
+def test_without_moves():
+    board = _board(dedent("""\
+                          | Y | R | BL | P |
+                          | Y | G | BL | R |
+                          | G | G | BK | G |
+                          | Y | G | BL | P |
+                          """),
+                   FOUR_SIDE_PARSER)
+
+    with_moves = resolve_cascade(board)
+    without_moves = resolve_cascade(board, moves=False)
+
+    eq_(with_moves.board, without_moves.board)
+    eq_(None, without_moves.levels[0].moved)
+    eq_(with_moves.levels[0].destroyed, without_moves.levels[0].destroyed)
+
+
+def test_max_levels():
+    board = _board(dedent("""\
+                          | Y | BL | P  | BK |
+                          | R | Y  | BL | P  |
+                          | P | Y  | BK | BL |
+                          | R | Y  | R  | R  |
+                          """),
+                   FOUR_SIDE_PARSER)
+    board.set_at(0, 1, colored_tile('R'))
+
+    cascade = resolve_cascade(board, max_levels=1)
+
+    eq_(1, len(cascade.levels))
+    eq_([right_match(4)(3, 0)], find_matches(cascade.board))
@@ -0,0 +1,100 @@
+import random
+from textwrap import dedent
+import time
+
+from nose.tools import eq_, ok_
+
+from cascade import ap_by_color, resolve_cascade
+from expected_ap import expected_aps, _behind
+from parse import create_board_parser, parse_board
+from strategy import find_moves
+from tiles import new_rand_tile
+
+
+FOUR_SIDE_PARSER = create_board_parser(side=4)
+
+COLORS = ['Y', 'R', 'G', 'BL', 'P', 'BK', 'T']
+
+BOARD = dedent("""\
+               | Y  | P  | BK | Y  |
+               | R  | BL | R  | P  |
+               | BK | Y  | P  | Y  |
+               | P  | P  | G  | P  |
+               """)
+
+
+def _ap(levels):
+    ap = ap_by_color(levels)
+    return [ap.get(color, 0) for color in COLORS]
+
+
+def test_matches_full_cascades():
+    random.seed(0)
+    board = parse_board(BOARD, FOUR_SIDE_PARSER)
+    moves_with_matches = find_moves(board, both_directions=False)
+    num = 1000
+    aps = expected_aps(board, moves_with_matches, COLORS,
+                       samples=num, min_samples=num)
+    for mwm, ap in zip(moves_with_matches, aps):
+        totals = [0] * len(COLORS)
+        for _ in range(num):
+            swapped = board.copy()
+            swapped.swap(mwm.from_sq[0], mwm.from_sq[1],
+                         mwm.to_sq[0], mwm.to_sq[1])
+            cascade = resolve_cascade(swapped, refill=new_rand_tile,
+                                      in_place=True, moves=False)
+            totals = [t + n for t, n in zip(totals, _ap(cascade.levels))]
+        for mean, total in zip(ap, totals):
+            ok_(abs(mean - float(total) / num) < 0.25)
+
+
+def test_leaves_board_alone():
+    board = parse_board(BOARD, FOUR_SIDE_PARSER)
+    orig = board.copy()
+    expected_aps(board, find_moves(board), COLORS, samples=4)
+    eq_(orig, board)
+
+
+def test_passed_deadline():
+    random.seed(0)
+    board = parse_board(BOARD, FOUR_SIDE_PARSER)
+    moves_with_matches = find_moves(board, both_directions=False)
+    ok_(len(moves_with_matches) > 1)
+    # only the first move is looked at, for one round
+    aps = expected_aps(board, moves_with_matches, COLORS,
+                       deadline=time.time() - 1)
+    eq_(1, len(aps))
+    eq_(len(COLORS), len(aps[0]))
+
+
+class _Samples(object):
+
+    def __init__(self, means, variances, num=10):
+        self._means = means
+        self._variances = variances
+        self.num = num
+
+    def means(self):
+        return self._means
+
+    def variances(self):
+        return self._variances
+
+
+def test_behind():
+    # (means, variances, leader means, leader variances, exp behind)
+    cases = [
+        ([1, 0], [0, 0], [2, 0], [0, 0], True),
+        ([1, 5], [0, 0], [1, 4], [0, 0], False),
+        ([1, 3], [0, 0], [1, 4], [0, 0], True),
+        ([1, 0], [1, 0], [2, 0], [1, 0], True),
+        ([1, 0], [10, 0], [2, 0], [10, 0], False),
+        ([1, 0], [0, 0], [1, 0], [0, 0], False),
+        ]
+    for means, variances, leader_means, leader_variances, exp in cases:
+        yield (_verify_behind, _Samples(means, variances),
+               _Samples(leader_means, leader_variances), exp)
+
+
+def _verify_behind(ms, leader, exp):
+    eq_(exp, _behind(ms, leader, 2.0))
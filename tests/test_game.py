@@ -249,5 +249,29 @@ def test_ensure_playable_board():
                           (0, 0, 1, 0)]
         eq_(expected_swaps, offense.update_tiles_swapped_calls)
         eq_(expected_swaps, defense.update_tiles_swapped_calls)
+        # each shuffle, then the move
+        eq_([(None, None)] * 3 + [(offense, ((0, 0), (1, 0)))],
+            game.history)
     finally:
         random.setstate(rand_state)
+
+
+def test_latency_stats():
+    board_s = dedent("""\
+                     | Y | G | BL | P |
+                     | Y | R | BL | R |
+                     | G | G | BK | G |
+                     | Y | G | BL | P |
+                     """)
+
+    for move_time, exp_hit in [(None, 0), (0.0, 1), (60.0, 0)]:
+        game = Game(board=parse_board(board_s, FOUR_SIDE_PARSER),
+                    offense=Player(strategy=first_move_strat),
+                    defense=Player(strategy=first_move_strat),
+                    stop_condition=_allow_one_move(),
+                    move_time=move_time)
+        game.play()
+        stats = game.latency_stats()
+        eq_(1, stats['decisions'])
+        eq_(exp_hit, stats['deadlines_hit'])
+        ok_(0 <= stats['mean'] <= stats['max'])
@@ -1,10 +1,10 @@
 import re
 from textwrap import dedent
 
-from nose.tools import eq_
+from nose.tools import eq_, ok_
 
 from parse import create_board_parser, parse_board, unparse_board
-from gravity import apply_gravity
+from gravity import apply_gravity, drop_tiles, disturbed_squares
 
 FOUR_SIDE_PARSER = create_board_parser(side=4)
 
@@ -135,3 +135,49 @@ def _verify_apply_gravity(board, exp_board_s, exp_moved):
     eq_(re.sub('\s', '', unparse_board(post_g_board)),
         re.sub('\s', '', unparse_board(post_gg_board)))
     eq_([], gg_moved)
+
+
+def test_apply_gravity_in_place():
+    for board_s, parser, exp_board_s, exp_moved in TEST_CASES:
+        board = parse_board(board_s, parser)
+        yield _verify_apply_gravity_in_place, board, exp_moved
+
+
+def _verify_apply_gravity_in_place(board, exp_moved):
+    expected, _ = apply_gravity(board)
+    post_g_board, moved = apply_gravity(board, in_place=True)
+    ok_(post_g_board is board)
+    eq_(expected, board)
+    eq_(expected.hash(), board.hash())
+    eq_(sorted(exp_moved), moved)
+
+
+def test_drop_tiles():
+    for board_s, parser, exp_board_s, exp_moved in TEST_CASES:
+        board = parse_board(board_s, parser)
+        yield _verify_drop_tiles, board, exp_moved
+
+
+def _verify_drop_tiles(board, exp_moved):
+    expected, _ = apply_gravity(board)
+    exp_depths = [0] * board.side
+    for _, (row, col) in exp_moved:
+        exp_depths[col] = max(exp_depths[col], row + 1)
+    eq_((expected, exp_depths), drop_tiles(board))
+
+
+def test_disturbed_squares():
+    cases = [
+        ([], []),
+        ([(0, 0)], [(0, 0)]),
+        ([(2, 1)], [(0, 1), (1, 1), (2, 1)]),
+        ([(1, 3), (2, 0), (0, 3)],
+         [(0, 0), (1, 0), (2, 0), (0, 3), (1, 3)]),
+        ]
+
+    for changed, expected in cases:
+        yield _verify_disturbed_squares, changed, expected
+
+
+def _verify_disturbed_squares(changed, expected):
+    eq_(expected, disturbed_squares(changed))
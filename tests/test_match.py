@@ -1,11 +1,19 @@
+import random
 from textwrap import dedent
 
 from nose.tools import eq_, ok_
 
+import board_aware_cache
+from bitboard import find_runs, find_runs_at
+from board import Board, neighbors
 from parse import create_board_parser, parse_board
 from match import find_matches, find_matches_at, find_left_match_at, \
-    find_right_match_at, find_up_match_at, find_down_match_at, Match
-from tutils import right_match, left_match, down_match, up_match
+    find_right_match_at, find_up_match_at, find_down_match_at, Match, \
+    mask_stride, _find_new_matches, _combine_matches, _scan_matches, \
+    _scan_matches_at
+from tiles import CRITICAL, EMPTY, TEAMUP, colored_tile
+from tutils import right_match, left_match, down_match, up_match, \
+    rand_stable_board_with_criticals
 
 
 THREE_SIDE_PARSER = create_board_parser(side=3)
@@ -348,6 +356,23 @@ def _verify_find_matches(board, expected):
     eq_(sorted(expected), find_matches(board))
 
 
+def test_find_matches_wide_board():
+    colors = ['Y', 'R', 'G', 'BL', 'P', 'BK']
+    rows = [[colored_tile(colors[(row + 2 * col) % len(colors)])
+             for col in range(10)]
+            for row in range(10)]
+    for col in range(7, 10):
+        rows[0][col] = colored_tile('R')
+    board = Board(rows)
+    expected = [Match([(0, 7), (0, 8), (0, 9)], mask_stride(10))]
+    board_aware_cache.clear()
+    eq_(expected, find_matches(board))
+    eq_(expected, _scan_matches_at(0, 9, board))
+    eq_({'rows': {0: 3}, 'cols': {}}, expected[0].max_extents)
+    ok_((0, 9) in expected[0])
+    ok_((1, 0) not in expected[0])
+
+
 def test_find_matches_with_stop_after():
     for (board_s, parser, expected) in FIND_MATCHES_CASES:
         board = parse_board(board_s, parser)
@@ -365,6 +390,164 @@ def _verify_find_matches_with_stop_after(board, expected, stop_after):
         ok_(any(m.contains_match(match) for m in expected))
 
 
+def test_find_new_matches():
+    for side in [4, 5, 8]:
+        for _ in range(5):
+            yield (_verify_find_new_matches,
+                   rand_stable_board_with_criticals(side))
+
+
+def _verify_find_new_matches(board):
+    for row, col in board.squares_from_bottom_right():
+        for row_n, col_n in neighbors(row, col, board.side):
+            swapped = board.copy()
+            swapped.swap(row, col, row_n, col_n)
+            board_aware_cache.clear()
+            expected = find_matches(swapped)
+            board_aware_cache.clear()
+            eq_(expected,
+                _find_new_matches(swapped, [(row, col), (row_n, col_n)]))
+
+
+def test_find_new_matches_leaves_find_matches_alone():
+    # a match away from the squares given, which _find_new_matches misses
+    board_s = dedent("""\
+                     | Y | Y | Y | R |
+                     | R | G | R | G |
+                     | G | R | G | R |
+                     | R | G | R | G |
+                     """)
+    board = parse_board(board_s, FOUR_SIDE_PARSER)
+    board_aware_cache.clear()
+    eq_([], _find_new_matches(board, [(3, 0), (3, 1)]))
+    eq_(1, len(find_matches(board)))
+
+
+def _pairwise_combine(matches, board):
+    """
+    The original combine loop, from before matches were combined as
+    disjoint sets, unchanged: it tries every pair of matches, in the order
+    given, until nothing more combines.
+    """
+    def _should_combine(m1, m2, board):
+        if not (set(m1.squares) & set(m2.squares)):
+            return False
+        for s1 in m1.squares:
+            for s2 in m2.squares:
+                if not board.at(s1[0], s1[1]).matches(board.at(s2[0],
+                                                               s2[1])):
+                    return False
+        return True
+
+    matches_l = list(matches)
+    length = len(matches_l)
+    i = 0
+    while i < length:
+        if matches_l[i] is None:
+            i += 1
+            continue
+        combined = False
+        for j in range(i, length):
+            if i == j:
+                continue
+            m1 = matches_l[i]
+            m2 = matches_l[j]
+            if m2 is None:
+                continue
+            if _should_combine(m1, m2, board):
+                matches_l[i] = m1.combine(m2)
+                matches_l[j] = None
+                combined = True
+        if not combined:
+            i += 1
+
+    return sorted(set([m for m in matches_l if m is not None]))
+
+
+# plenty of criticals, so runs overlap and combining is often ambiguous
+CRITICAL_HEAVY_TILES = [colored_tile('Y'),
+                        colored_tile('R'),
+                        CRITICAL,
+                        CRITICAL,
+                        TEAMUP,
+                        EMPTY]
+
+
+def test_combine_order_is_canonical():
+    # the criticals could go with the G below them or with either R row;
+    # in sorted order the top R row comes first, and takes them (and the
+    # other R row through them)
+    board_s = dedent("""\
+                     | R | R  | C | Y  |
+                     | P | BK | C | Y  |
+                     | R | R  | C | P  |
+                     | P | Y  | G | BK |
+                     """)
+    board = parse_board(board_s, FOUR_SIDE_PARSER)
+    expected = [Match([(0, 0), (0, 1), (0, 2), (1, 2),
+                       (2, 0), (2, 1), (2, 2)]),
+                down_match(4)(0, 2)]
+    board_aware_cache.clear()
+    eq_(expected, find_matches(board))
+    runs = _scan_matches(board, None)
+    for order in [sorted(runs), sorted(runs, reverse=True)]:
+        eq_(expected, _combine_matches(order, board))
+
+
+def test_combine_matches():
+    for side in [4, 5, 8]:
+        for _ in range(50):
+            board = Board([[random.choice(CRITICAL_HEAVY_TILES)
+                            for _ in range(side)]
+                           for _ in range(side)])
+            yield _verify_combine_matches, board
+
+
+def _verify_combine_matches(board):
+    matches = set(Match(run) for run in find_runs(board))
+    combined = _combine_matches(matches, board)
+    # the old loop, taking the matches in sorted order
+    eq_(_pairwise_combine(sorted(matches), board), combined)
+    # in set order (as it used to) it agrees too, unless criticals join
+    # runs of more than one color, when order matters
+    if not _joins_colors(matches, board):
+        eq_(_pairwise_combine(matches, board), combined)
+
+
+def _joins_colors(matches, board):
+    """
+    Return whether any group of overlapping `matches` holds more than one
+    color.
+    """
+    groups = []
+    for match in matches:
+        squares = set(match.squares)
+        colors = set([match.color(board)]) - set([None])
+        for group in [g for g in groups if g[0] & squares]:
+            groups.remove(group)
+            squares |= group[0]
+            colors |= group[1]
+        groups.append((squares, colors))
+    return any(len(colors) > 1 for _, colors in groups)
+
+
+def test_scan_matches():
+    for side in [3, 4, 5, 8]:
+        for _ in range(25):
+            board = Board([[random.choice(CRITICAL_HEAVY_TILES)
+                            for _ in range(side)]
+                           for _ in range(side)])
+            yield _verify_scan_matches, board
+
+
+def _verify_scan_matches(board):
+    eq_(set(Match(run) for run in find_runs(board)),
+        _scan_matches(board, None))
+    for row, col in board.squares_from_bottom_right():
+        eq_(sorted(Match(run) for run in find_runs_at(row, col, board)),
+            _scan_matches_at(row, col, board))
+
+
 def test_count_tiles_in_match():
     cases = [
         ([], 0),
@@ -449,6 +632,55 @@ def _verify_contains_match(m1, m2, contains):
     eq_(contains, m1.contains_match(m2))
 
 
+def test_match_order():
+    for _ in range(200):
+        squares_1 = _rand_squares()
+        squares_2 = _rand_squares()
+        yield _verify_match_order, squares_1, squares_2
+
+
+def _rand_squares():
+    return random.sample([(row, col) for row in range(8) for col in range(8)],
+                         random.randint(0, 6))
+
+
+def _verify_match_order(squares_1, squares_2):
+    m1, m2 = Match(squares_1), Match(squares_2)
+    eq_(cmp(sorted(squares_1), sorted(squares_2)), cmp(m1, m2))
+    eq_(sorted(squares_1) == sorted(squares_2), m1 == m2)
+
+
+def test_match_mask():
+    for _ in range(50):
+        yield _verify_match_mask, _rand_squares()
+
+
+def _verify_match_mask(squares):
+    match = Match(squares)
+    eq_(sorted(squares), match.squares)
+    eq_(match, Match.from_mask(match.mask))
+    eq_(len(squares), match.tile_count)
+    for square in squares:
+        ok_(square in match)
+    ok_((8, 8) not in match)
+
+
+def test_longest_extent():
+    cases = [
+        ([(0, 1), (0, 2), (0, 3)], 3),
+        ([(0, 0), (1, 0), (2, 0), (3, 0)], 4),
+        ([(0, 2), (1, 0), (1, 1), (1, 2), (1, 3), (2, 2)], 4),
+        ([(0, 0), (0, 1)], 0),
+        ]
+
+    for match_args, expected in cases:
+        yield _verify_longest_extent, match_args, expected
+
+
+def _verify_longest_extent(match_args, expected):
+    eq_(expected, Match(match_args).longest_extent)
+
+
 def test_color():
     board_s = dedent("""\
                      | C | C | Y |
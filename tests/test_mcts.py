@@ -0,0 +1,177 @@
+import random
+from textwrap import dedent
+import time
+
+from nose.tools import eq_, ok_
+
+from game import Game, GameState
+from mcts import create_mcts_strat, _descend, _reused_root, _search, \
+    _Node
+from parse import create_board_parser, parse_board
+from player import Player
+from stable_board import rand_stable_board
+from strategy import find_moves, no_move_strat
+from tutils import game_state
+
+
+FOUR_SIDE_PARSER = create_board_parser(side=4)
+
+COLORS = ['Y', 'R', 'G', 'BL', 'P', 'BK']
+
+
+def test_no_moves():
+    board = parse_board(dedent("""\
+                               | Y | P | P | Y |
+                               | R | G | R | Y |
+                               | Y | G | R | G |
+                               | R | Y | P | G |
+                               """),
+                        FOUR_SIDE_PARSER)
+    eq_(None, create_mcts_strat(COLORS, iterations=10)(game_state(board)))
+
+
+def test_only_move():
+    board = parse_board(dedent("""\
+                               | Y | P | P | Y |
+                               | R | G | R | P |
+                               | Y | G | R | G |
+                               | R | Y | P | G |
+                               """),
+                        FOUR_SIDE_PARSER)
+    eq_(((0, 3), (1, 3)),
+        create_mcts_strat(COLORS, iterations=10)(game_state(board)))
+
+
+def test_legal_move():
+    for seed in range(3):
+        yield _verify_legal_move, seed
+
+
+def _verify_legal_move(seed):
+    random.seed(seed)
+    board = rand_stable_board()
+    orig = board.copy()
+    move = create_mcts_strat(COLORS, iterations=50)(game_state(board))
+    eq_(orig, board)
+    ok_(move in [(m.from_sq, m.to_sq)
+                 for m in find_moves(board, both_directions=False)])
+
+
+def test_takes_the_bigger_match():
+    random.seed(0)
+    board = parse_board(dedent("""\
+                               | Y  | P  | BK | Y  |
+                               | R  | BL | R  | P  |
+                               | BK | Y  | P  | Y  |
+                               | P  | P  | G  | P  |
+                               """),
+                        FOUR_SIDE_PARSER)
+    # swapping the G up makes a four of P; the other moves make threes
+    eq_(((2, 2), (3, 2)),
+        create_mcts_strat(['P'], iterations=200, depth=1)(
+            game_state(board)))
+
+
+def test_time_budget():
+    random.seed(0)
+    board = rand_stable_board()
+    ok_(create_mcts_strat(COLORS, time_budget=0.0)(game_state(board)))
+
+
+def test_passed_deadline():
+    random.seed(0)
+    board = rand_stable_board()
+    strat = create_mcts_strat(COLORS, iterations=1000)
+    ok_(strat(game_state(board), deadline=time.time() - 1))
+
+
+def test_reuses_tree():
+    random.seed(0)
+    board = rand_stable_board()
+    root = _search(_Node(), board, set(COLORS), 20, None, 2, 2.0)
+    eq_(20, root.visits)
+    ok_(root is _search(root, board, set(COLORS), 20, None, 2, 2.0))
+    eq_(40, root.visits)
+
+
+def test_revisits_nodes():
+    random.seed(0)
+    board = rand_stable_board()
+    root = _search(_Node(), board, set(COLORS), 500, None, 3, 2.0)
+    children = root.children.values()
+    ok_(any(child.visits > 1 for child in children))
+    ok_(any(grandchild.visits > 1
+            for child in children
+            for grandchild in child.children.values()))
+
+
+def test_max_nodes():
+    random.seed(0)
+    board = rand_stable_board()
+    root = _search(_Node(), board, set(COLORS), 100, None, 3, 2.0,
+                   max_nodes=10)
+    eq_(10, root.size())
+
+
+def test_descends_into_played_moves():
+    random.seed(0)
+    board = rand_stable_board()
+    root = _search(_Node(), board, set(COLORS), 300, None, 3, 2.0)
+    us, them = object(), object()
+    (move, matched_five), child = max(root.children.items(),
+                                      key=lambda item: item[1].visits)
+    ok_(not matched_five)
+    (reply, _), grandchild = max(
+        [item for item in child.children.items() if not item[0][1]],
+        key=lambda item: item[1].visits)
+    ok_(grandchild.visits)
+
+    eq_(root, _descend(root, [], us))
+    # moves as a player might give them, larger square first
+    eq_(grandchild, _descend(root, [(us, move), (them, reply[::-1])], us))
+    eq_(None, _descend(root, [(us, move), (them, None)], us))
+    eq_(None, _descend(root, [(them, move)], us))
+    # reshuffled
+    eq_(None, _descend(root, [(us, move), (None, None), (them, reply)], us))
+
+
+def test_reused_root():
+    random.seed(0)
+    board = rand_stable_board()
+    root = _search(_Node(), board, set(COLORS), 300, None, 3, 2.0)
+    us, them = object(), object()
+    (move, _), child = max([item for item in root.children.items()
+                            if not item[0][1]],
+                           key=lambda item: item[1].visits)
+    (reply, _), grandchild = max(
+        [item for item in child.children.items() if not item[0][1]],
+        key=lambda item: item[1].visits)
+    history = [(them, ((0, 0), (0, 1)))]
+    trees = {us: (root, history, 1)}
+
+    def _state(history):
+        return GameState(board=board, offense=them, defense=us, to_move=us,
+                         move_count=1, turn_count=1,
+                         history=history)
+
+    history.extend([(us, move), (them, reply)])
+    eq_(grandchild, _reused_root(trees, _state(history)))
+    eq_(None, _reused_root(trees, _state(None)))
+    eq_(None, _reused_root({}, _state(history)))
+    # a new game, shorter or not
+    eq_(None, _reused_root(trees, _state([])))
+    eq_(None, _reused_root(trees, _state(list(history))))
+    # a new game in the same history list
+    del history[:]
+    eq_(None, _reused_root(trees, _state(history)))
+
+
+def test_plays_game():
+    random.seed(0)
+    offense = Player(strategy=create_mcts_strat(COLORS, iterations=20))
+    game = Game(board=rand_stable_board(),
+                offense=offense,
+                defense=Player(strategy=no_move_strat),
+                stop_condition=lambda game_state: game_state.turn_count > 3)
+    game.play()
+    ok_(offense.ap)
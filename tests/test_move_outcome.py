@@ -0,0 +1,52 @@
+from nose.tools import eq_, ok_
+
+import board_aware_cache
+from board import Board
+from move_outcome import move_outcome
+from square import sq
+from tiles import colored_tile, ProtectTile, EMPTY
+
+
+def _protect_board():
+    """
+    | G | R | G  | R     |
+    | R | Y | BL | BL    |
+    | P | G | Y  | G     |
+    | R | R | G  | G P<3 |
+    """
+    rows = [[colored_tile(c) for c in colors.split()]
+            for colors in ['G R G R', 'R Y BL BL', 'P G Y G', 'R R G G']]
+    rows[3][3] = ProtectTile('G', 3, '<')
+    return Board(rows)
+
+
+def test_move_outcome():
+    board = _protect_board()
+    orig = board.copy()
+
+    outcome = move_outcome(board, sq(2, 1), sq(3, 1))
+
+    eq_(orig, board)
+    eq_({'G': 3}, outcome.ap)
+    eq_([(3, 1), (3, 2), (3, 3)], [square for square, _ in outcome.destroyed])
+    eq_([], outcome.crits)
+    ok_(not outcome.matched_five)
+    eq_(3, outcome.protection_lost('<'))
+    eq_(0, outcome.protection_lost('>'))
+    eq_(0, outcome.board.protection('<'))
+    eq_(EMPTY, outcome.board.at(0, 1))
+
+
+def test_protection_kept():
+    outcome = move_outcome(_protect_board(), sq(2, 2), sq(3, 2))
+    eq_({'G': 3}, outcome.ap)
+    eq_(0, outcome.protection_lost('<'))
+    eq_(3, outcome.board.protection('<'))
+
+
+def test_shared_between_directions():
+    board_aware_cache.clear()
+    board = _protect_board()
+    outcome = move_outcome(board, sq(2, 1), sq(3, 1))
+    ok_(outcome is move_outcome(board, sq(3, 1), sq(2, 1)))
+    ok_(outcome is move_outcome(board.copy(), sq(2, 1), sq(3, 1)))
@@ -0,0 +1,146 @@
+import random
+
+from nose.plugins.skip import SkipTest
+from nose.tools import eq_
+
+from bitboard import find_runs
+from board import Board
+import board_aware_cache
+from board_settler import settle_board
+from gravity import apply_gravity
+from match import find_matches
+import numpy_backend
+from stable_board import rand_stable_board
+from strategy import find_moves
+from tile_destroyer import destroy_tiles
+from tiles import ColoredTile, CriticalTile, TeamupTile, EmptyTile, \
+    ProtectTile, NullTile
+
+
+# few colors, so random boards are full of matches and cascades
+TILE_FUNCS = [lambda: ColoredTile('Y'),
+              lambda: ColoredTile('R'),
+              lambda: ColoredTile('G'),
+              lambda: ProtectTile('Y', random.randint(1, 9), '<'),
+              CriticalTile,
+              TeamupTile,
+              NullTile,
+              EmptyTile]
+
+
+def _rand_board(side):
+    return Board([[random.choice(TILE_FUNCS)() for _ in range(side)]
+                  for _ in range(side)])
+
+
+def _rand_boards():
+    for side in [3, 4, 5, 8]:
+        for _ in range(10):
+            yield _rand_board(side)
+
+
+def setup():
+    if not numpy_backend.available():
+        raise SkipTest("NumPy isn't installed")
+
+
+def test_find_runs():
+    for board in _rand_boards():
+        yield _verify_find_runs, board
+
+
+def _verify_find_runs(board):
+    eq_(find_runs(board), numpy_backend.find_runs(board))
+
+
+def test_destroy_tiles():
+    for board in _rand_boards():
+        yield _verify_destroy_tiles, board
+
+
+def _verify_destroy_tiles(board):
+    exp_board, exp_destroyed = destroy_tiles(board)
+    new_board, destroyed = numpy_backend.destroy_tiles(board)
+    eq_(exp_destroyed, destroyed)
+    eq_(exp_board, new_board)
+    eq_(exp_board.hash(), new_board.hash())
+
+
+def test_apply_gravity():
+    for board in _rand_boards():
+        yield _verify_apply_gravity, board
+
+
+def _verify_apply_gravity(board):
+    exp_board, exp_moved = apply_gravity(board)
+    new_board, moved = numpy_backend.apply_gravity(board)
+    eq_(exp_moved, moved)
+    eq_(exp_board, new_board)
+    eq_(exp_board.hash(), new_board.hash())
+
+
+def test_settle_board():
+    for board in _rand_boards():
+        yield _verify_settle_board, board
+
+
+def _verify_settle_board(board):
+    rand_state = random.getstate()
+    exp_board = settle_board(board)
+    random.setstate(rand_state)
+    eq_(exp_board, numpy_backend.settle_board(board))
+
+
+def test_enable():
+    for board in _rand_boards():
+        yield _verify_enable, board
+
+
+def _verify_enable(board):
+    exp_matches = find_matches(board)
+    exp_board, exp_destroyed = destroy_tiles(board)
+    numpy_backend.enable()
+    board_aware_cache.clear()
+    try:
+        eq_(exp_matches, find_matches(board))
+        eq_((exp_board, exp_destroyed), destroy_tiles(board))
+    finally:
+        numpy_backend.enable(False)
+
+
+def test_swapped_boards():
+    board = _rand_board(5)
+    batch = numpy_backend.swapped_boards(board)
+    swaps = numpy_backend.candidate_swaps(5)
+    eq_((len(swaps), 5, 5), batch.shape)
+    for i, ((row, col), (row_n, col_n)) in enumerate(swaps):
+        swapped = board.copy()
+        swapped.swap(row, col, row_n, col_n)
+        eq_(swapped, numpy_backend.to_board(batch[i], swapped.specials))
+
+
+def test_find_moves():
+    for board in list(_rand_boards()) + [rand_stable_board()
+                                         for _ in range(10)]:
+        yield _verify_find_moves, board
+
+
+def _verify_find_moves(board):
+    board_aware_cache.clear()
+    exp_moves = find_moves(board)
+    exp_first_move = find_moves(board, stop_after=1)
+    numpy_backend.enable()
+    board_aware_cache.clear()
+    try:
+        eq_(exp_moves, find_moves(board))
+        eq_(exp_first_move, find_moves(board, stop_after=1))
+    finally:
+        numpy_backend.enable(False)
+
+
+def test_unknown_tiles():
+    board = Board([['A', 'B', 'C'], ['D', 'E', 'F'], ['G', 'H', 'I']])
+    eq_(None, numpy_backend.find_runs(board))
+    eq_(None, numpy_backend.destroy_tiles(board))
+    eq_(None, numpy_backend.settle_board(board))
+    eq_(None, numpy_backend.legal_swaps(board))
@@ -0,0 +1,159 @@
+import random
+import time
+
+from nose.tools import eq_, ok_
+
+from board import Board
+from scoring_pool import ScoringPool, pack_board, unpack_board, \
+    DEADLINE_CHUNK
+from stable_board import rand_stable_board
+from strategy import find_moves, create_ap_seeking_strat, \
+    create_protect_protects_strat, _move_ap
+from tiles import ColoredTile, ProtectTile, CountdownTile
+from tutils import game_state
+
+
+COLORS = ['Y', 'R', 'BK', 'T']
+
+_POOL = None
+
+
+def setup_module():
+    global _POOL
+    _POOL = ScoringPool(processes=2)
+
+
+def teardown_module():
+    _POOL.close()
+
+
+def _protect_board(seed):
+    random.seed(seed)
+    board = rand_stable_board(no_teamups=True)
+    squares = list(board.squares_from_bottom_right())
+    random.shuffle(squares)
+    for row, col in squares[:16]:
+        board.set_at(row, col,
+                     ProtectTile(board.at(row, col).color, 4, '<'))
+    return board
+
+
+def test_pack_board():
+    board = _protect_board(0)
+    board.set_at(0, 0, CountdownTile('Y', 3))
+    unpacked = unpack_board(pack_board(board))
+    eq_(board, unpacked)
+    eq_(board.hash(), unpacked.hash())
+    ok_(isinstance(unpacked, Board))
+
+
+def test_pack_countdown_callback():
+    # sent without its callback, which needn't pickle
+    board = _protect_board(0)
+    board.set_at(0, 0, CountdownTile('Y', 3, on_countdown=lambda: None))
+    unpacked = unpack_board(pack_board(board))
+    eq_(CountdownTile('Y', 3), unpacked.at(0, 0))
+    eq_(board.hash(), unpacked.hash())
+    moves = [(m.from_sq, m.to_sq)
+             for m in find_moves(board, both_directions=False)]
+    eq_([_move_ap(board, a, b, COLORS) for a, b in moves],
+        _POOL.score(_move_ap, board, moves, COLORS))
+
+
+class _CallbackTile(ColoredTile):
+    # a special tile of a type pack_board doesn't know, that can't pickle
+
+    def __init__(self, color):
+        super(_CallbackTile, self).__init__(color)
+        self.callback = lambda: None
+
+
+def test_unpicklable_scored_in_process():
+    board = _protect_board(1)
+    board.set_at(0, 0, _CallbackTile('Y'))
+    moves = [(m.from_sq, m.to_sq)
+             for m in find_moves(board, both_directions=False)]
+    expected = [_move_ap(board, a, b, COLORS) for a, b in moves]
+    eq_(expected, _POOL.score(_move_ap, board, moves, COLORS))
+    eq_(expected, _POOL.score_until(time.time() + 60, _move_ap, board,
+                                    moves, COLORS))
+
+
+def test_scores_in_order():
+    for seed in range(3):
+        yield _verify_scores_in_order, seed
+
+
+def _verify_scores_in_order(seed):
+    board = _protect_board(seed)
+    moves = [(m.from_sq, m.to_sq)
+             for m in find_moves(board, both_directions=False)]
+    eq_([_move_ap(board, a, b, COLORS) for a, b in moves],
+        _POOL.score(_move_ap, board, moves, COLORS))
+
+
+def test_score_until():
+    board = _protect_board(0)
+    moves = [(m.from_sq, m.to_sq)
+             for m in find_moves(board, both_directions=False)]
+    expected = _POOL.score(_move_ap, board, moves, COLORS)
+    eq_(expected, _POOL.score_until(None, _move_ap, board, moves, COLORS))
+    eq_(expected, _POOL.score_until(time.time() + 60, _move_ap, board,
+                                    moves, COLORS))
+    # past the deadline, only the first few
+    scores = _POOL.score_until(time.time() - 1, _move_ap, board, moves,
+                               COLORS)
+    eq_(expected[:DEADLINE_CHUNK], scores)
+
+
+def test_waits_for_outstanding():
+    board = _protect_board(0)
+    moves = [(m.from_sq, m.to_sq)
+             for m in find_moves(board, both_directions=False)]
+    _POOL.score_until(time.time() - 1, _move_ap, board, moves, COLORS)
+    outstanding = list(_POOL._outstanding)
+    ok_(outstanding)
+    _POOL.score(_move_ap, board, moves[:1], COLORS)
+    ok_(all(result.ready() for result in outstanding))
+    eq_([], _POOL._outstanding)
+
+
+def test_no_moves():
+    eq_([], _POOL.score(_move_ap, rand_stable_board(), [], COLORS))
+
+
+def test_strats_same_as_serial():
+    for seed in range(3):
+        yield _verify_strats_same_as_serial, seed
+
+
+def _verify_strats_same_as_serial(seed):
+    board = _protect_board(seed)
+    eq_(create_ap_seeking_strat(COLORS)(game_state(board)),
+        create_ap_seeking_strat(COLORS, pool=_POOL)(game_state(board)))
+    random.seed(seed)
+    serial = create_protect_protects_strat('<')(game_state(board))
+    random.seed(seed)
+    eq_(serial,
+        create_protect_protects_strat('<', pool=_POOL)(game_state(board)))
+
+
+def test_strats_with_deadline_same_as_serial():
+    for seed in range(3):
+        yield _verify_strats_with_deadline_same_as_serial, seed
+
+
+def _verify_strats_with_deadline_same_as_serial(seed):
+    board = _protect_board(seed)
+    deadline = time.time() + 60
+    eq_(create_ap_seeking_strat(COLORS)(game_state(board),
+                                        deadline=deadline),
+        create_ap_seeking_strat(COLORS, pool=_POOL)(game_state(board),
+                                                    deadline=deadline))
+    random.seed(seed)
+    serial = create_protect_protects_strat('<')(game_state(board),
+                                                deadline=deadline)
+    random.seed(seed)
+    eq_(serial,
+        create_protect_protects_strat('<', pool=_POOL)(game_state(board),
+                                                       deadline=deadline))
@@ -11,6 +11,18 @@ def test_rand_stable_board():
         yield _verify_rand_stable_board, rand_stable_board()
 
 
+def test_rand_stable_board_sides():
+    for side in range(4, 9):
+        yield _verify_rand_stable_board, rand_stable_board(side)
+
+
+def test_rand_stable_board_no_teamups():
+    for _ in range(3):
+        board = rand_stable_board(no_teamups=True)
+        yield _verify_rand_stable_board, board
+        yield _verify_no_teamups, board
+
+
 def _verify_rand_stable_board(board):
     eq_([], find_matches(board))
     ok_(find_moves(board))
@@ -18,3 +30,7 @@ def _verify_rand_stable_board(board):
     for row, col in board.squares_from_bottom_right():
         tile = board.at(row, col)
         ok_(isinstance(tile, (ColoredTile, TeamupTile)))
+
+
+def _verify_no_teamups(board):
+    ok_(not any(tile.is_teamup() for tile in board))
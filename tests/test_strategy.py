@@ -1,13 +1,18 @@
+import random
 from textwrap import dedent
+import time
 
 from nose.tools import eq_, ok_
 
-from game import GameState
-from match import Match
+from board import Board, neighbors
+from match import Match, find_matches
 from parse import create_board_parser, parse_board
+from stable_board import rand_stable_board
 from strategy import find_moves, rand_move_strat, first_move_strat, \
-    no_move_strat, create_ap_seeking_strat
-from tutils import right_match, down_match
+    no_move_strat, create_ap_seeking_strat, has_any_move, \
+    create_protect_protects_strat
+from tiles import colored_tile, ProtectTile
+from tutils import game_state, right_match, down_match
 
 FOUR_SIDE_PARSER = create_board_parser(side=4)
 FIVE_SIDE_PARSER = create_board_parser(side=5)
@@ -80,7 +85,9 @@ def test_find_moves():
 
 
 def _verify_find_moves(board, exp_moves_non_sym):
+    orig_hash = board.hash()
     moves_with_matches = find_moves(board)
+    eq_(orig_hash, board.hash())
     exp_moves = exp_moves_non_sym + [(b, a, m)
                                      for a, b, m
                                      in exp_moves_non_sym]
@@ -92,6 +99,52 @@ def _verify_find_moves_with_stop(board, exp_moves_non_sym, num_moves):
     eq_(num_moves, len(moves_with_matches))
 
 
+def test_find_moves_one_direction():
+    for board_s, parser, exp_moves_non_sym in FIND_MOVES_CASES:
+        board = parse_board(board_s, parser)
+        yield _verify_find_moves_one_direction, board, exp_moves_non_sym
+        for num_moves in range(1, len(exp_moves_non_sym) + 1):
+            yield (_verify_find_moves_one_direction_with_stop, board,
+                   num_moves)
+
+
+def _verify_find_moves_one_direction(board, exp_moves_non_sym):
+    exp_moves = [(min(a, b), max(a, b), m) for a, b, m in exp_moves_non_sym]
+    eq_(sorted(exp_moves), find_moves(board, both_directions=False))
+
+
+def _verify_find_moves_one_direction_with_stop(board, num_moves):
+    moves_with_matches = find_moves(board, stop_after=num_moves,
+                                    both_directions=False)
+    eq_(num_moves, len(moves_with_matches))
+    ok_(all(from_sq < to_sq for from_sq, to_sq, _ in moves_with_matches))
+
+
+def test_find_moves_wide_board():
+    random.seed(0)
+    board = rand_stable_board(10)
+    expected = []
+    for row, col in board.squares_from_bottom_right():
+        for row_n, col_n in neighbors(row, col, board.side):
+            swapped = board.copy()
+            swapped.swap(row, col, row_n, col_n)
+            matches = find_matches(swapped)
+            if matches:
+                expected.append(((row, col), (row_n, col_n), matches))
+    ok_(expected)
+    eq_(sorted(expected), find_moves(board))
+
+
+def test_has_any_move():
+    for board_s, parser, exp_moves_non_sym in FIND_MOVES_CASES:
+        board = parse_board(board_s, parser)
+        yield _verify_has_any_move, board, bool(exp_moves_non_sym)
+
+
+def _verify_has_any_move(board, expected):
+    eq_(expected, has_any_move(board))
+
+
 def test_rand_move_strat():
     for board_s, parser, exp_moves_non_sym in FIND_MOVES_CASES:
         board = parse_board(board_s, parser)
@@ -100,7 +153,7 @@ def test_rand_move_strat():
 
 
 def _verify_rand_move_strat(board, exp_moves_non_sym):
-    move = rand_move_strat(_game_state(board))
+    move = rand_move_strat(game_state(board))
     if not exp_moves_non_sym:
         eq_(None, move)
     else:
@@ -117,7 +170,7 @@ def test_first_move_strat():
 
 
 def _verify_first_move_strat(board, exp_moves_non_sym):
-    move = first_move_strat(_game_state(board))
+    move = first_move_strat(game_state(board))
     if not exp_moves_non_sym:
         eq_(None, move)
     else:
@@ -135,7 +188,20 @@ def test_no_move_strat():
 
 
 def _verify_no_move_strat(board):
-    eq_(None, no_move_strat(_game_state(board)))
+    eq_(None, no_move_strat(game_state(board)))
+
+
+def test_protect_protects_strat():
+    rows = [[colored_tile(c) for c in colors.split()]
+            for colors in ['G R G R', 'R Y BL BL', 'P G Y G', 'R R G G']]
+    rows[3][3] = ProtectTile('G', 3, '<')
+    board = Board(rows)
+    strat = create_protect_protects_strat('<')
+    for _ in range(10):
+        # the other move matches the protect tile away
+        eq_(((2, 2), (3, 2)), strat(game_state(board)))
+    eq_(None, strat(game_state(parse_board(FIND_MOVES_CASES[0][0],
+                                           FIND_MOVES_CASES[0][1]))))
 
 
 # (desc, board, parser, colors, exp move)
@@ -253,13 +319,38 @@ def test_ap_seeking_strat():
 
 
 def _verify_ap_seeking_strat(desc, board, colors, exp_move):
-    eq_(exp_move, create_ap_seeking_strat(colors)(_game_state(board)))
+    eq_(exp_move, create_ap_seeking_strat(colors)(game_state(board)))
+
+
+def test_strats_with_passed_deadline():
+    for board_s, parser, exp_moves_non_sym in FIND_MOVES_CASES:
+        board = parse_board(board_s, parser)
+        for strat in [create_ap_seeking_strat(['Y', 'P']),
+                      create_ap_seeking_strat(['Y', 'P'], refill_samples=8),
+                      create_protect_protects_strat('<')]:
+            yield (_verify_strat_with_passed_deadline, strat, board,
+                   exp_moves_non_sym)
+
+
+def _verify_strat_with_passed_deadline(strat, board, exp_moves_non_sym):
+    move = strat(game_state(board), deadline=time.time() - 1)
+    if not exp_moves_non_sym:
+        eq_(None, move)
+    else:
+        ok_(move in [(min(a, b), max(a, b)) for a, b, m in exp_moves_non_sym])
+
 
+def test_ap_seeking_strat_refill_samples():
+    for board_s, parser, exp_moves_non_sym in FIND_MOVES_CASES:
+        board = parse_board(board_s, parser)
+        yield (_verify_ap_seeking_strat_refill_samples, board,
+               exp_moves_non_sym)
 
-def _game_state(board):
-    return GameState(board=board,
-                     offense=None,
-                     defense=None,
-                     turn_count=1,
-                     move_count=1,
-                     to_move=None)
+
+def _verify_ap_seeking_strat_refill_samples(board, exp_moves_non_sym):
+    move = create_ap_seeking_strat(['Y', 'P'], refill_samples=8)(
+        game_state(board))
+    if not exp_moves_non_sym:
+        eq_(None, move)
+    else:
+        ok_(move in [(min(a, b), max(a, b)) for a, b, m in exp_moves_non_sym])
@@ -2,7 +2,7 @@ from nose.tools import eq_, ok_
 
 from tiles import EmptyTile, ColoredTile, CriticalTile, TeamupTile, \
     StrikeTile, AttackTile, ProtectTile, CountdownTile, NullTile, \
-    new_rand_tile
+    new_rand_tile, colored_tile, NEW_TILES
 
 
 YELLOW = ColoredTile('Y')
@@ -173,3 +173,55 @@ def test_new_rand_tile():
 def _verify_legal_rand_tile(tile):
     ok_(isinstance(tile, ColoredTile) or
         isinstance(tile, TeamupTile))
+
+
+# (t1, t2, should_be_equal)
+TILE_EQ_TESTS = [
+    (YELLOW, YELLOW2, True),
+    (YELLOW, RED, False),
+    (YELLOW, colored_tile('Y'), True),
+    (YELLOW, YELLOW_STRIKE_123_OFFENSE, False),
+    (YELLOW_STRIKE_123_OFFENSE, StrikeTile('Y', 123, '<'), True),
+    (YELLOW_STRIKE_123_OFFENSE, YELLOW_STRIKE_124_OFFENSE, False),
+    (YELLOW_STRIKE_123_OFFENSE, YELLOW_STRIKE_123_DEFENSE, False),
+    (YELLOW_STRIKE_123_OFFENSE, YELLOW_ATTACK_123_OFFENSE, False),
+    (YELLOW_PROTECT_123_OFFENSE, ProtectTile('Y', 123, '<'), True),
+    (YELLOW_COUNTDOWN_5, CountdownTile('Y', 5), True),
+    (YELLOW_COUNTDOWN_5, YELLOW_COUNTDOWN_6, False),
+    (EMPTY, EMPTY2, True),
+    (EMPTY, NULL, False),
+    (CRITICAL, CRITICAL2, True),
+    (CRITICAL, TEAMUP, False),
+    (TEAMUP, TEAMUP2, True),
+    ]
+
+
+def test_tile_eq():
+    for t1, t2, should_be_equal in TILE_EQ_TESTS:
+        yield _verify_tile_eq, t1, t2, should_be_equal
+        yield _verify_tile_eq, t2, t1, should_be_equal
+
+
+def _verify_tile_eq(t1, t2, should_be_equal):
+    eq_(should_be_equal, t1 == t2)
+    eq_(not should_be_equal, t1 != t2)
+    if should_be_equal:
+        eq_(hash(t1), hash(t2))
+
+
+def test_shared_tiles():
+    ok_(colored_tile('Y') is colored_tile('Y'))
+    for _ in range(20):
+        tile = new_rand_tile()
+        ok_(any(tile is t for t in NEW_TILES))
+
+
+def test_slots():
+    for tile in [YELLOW, EMPTY, NULL, CRITICAL, TEAMUP,
+                 YELLOW_STRIKE_123_OFFENSE, YELLOW_ATTACK_123_OFFENSE,
+                 YELLOW_PROTECT_123_OFFENSE, YELLOW_COUNTDOWN_5]:
+        yield _verify_slots, tile
+
+
+def _verify_slots(tile):
+    ok_(not hasattr(tile, '__dict__'))
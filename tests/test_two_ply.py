@@ -0,0 +1,99 @@
+import random
+from textwrap import dedent
+import time
+
+from nose.tools import eq_, ok_
+
+from aimulator import ai_moves
+from move_outcome import move_outcome
+from parse import create_board_parser, parse_board
+from stable_board import rand_stable_board
+from strategy import find_moves
+from tutils import game_state
+from two_ply import create_two_ply_strat, expected_reply_ap
+
+
+COLORS = ['Y', 'R', 'BK']
+
+AI_COLORS = ['G', 'BL', 'P', 'R']
+
+
+def _unpruned_move(board):
+    """
+    Score every move, with no pruning or caching of replies.
+    """
+    scored = []
+    for mwm in find_moves(board, both_directions=False):
+        outcome = move_outcome(board, mwm.from_sq, mwm.to_sq)
+        score = outcome.ap_in(COLORS)
+        if not outcome.matched_five:
+            replies = ai_moves(outcome.board, AI_COLORS)
+            if replies:
+                score -= (float(sum(move_outcome(outcome.board, a, b)
+                                    .ap_in(AI_COLORS)
+                                    for a, b, _ in replies)) /
+                          len(replies))
+        scored.append((-score, (mwm.from_sq, mwm.to_sq)))
+    return min(scored)[1] if scored else None
+
+
+def test_same_as_unpruned():
+    for seed in range(5):
+        yield _verify_same_as_unpruned, seed
+
+
+def _verify_same_as_unpruned(seed):
+    random.seed(seed)
+    board = rand_stable_board()
+    orig = board.copy()
+    move = create_two_ply_strat(COLORS, AI_COLORS)(game_state(board))
+    eq_(orig, board)
+    eq_(_unpruned_move(board), move)
+
+
+def test_passed_deadline():
+    random.seed(0)
+    board = rand_stable_board()
+    move = create_two_ply_strat(COLORS, AI_COLORS)(game_state(board),
+                                                   deadline=time.time() - 1)
+    ok_(move in [(m.from_sq, m.to_sq)
+                 for m in find_moves(board, both_directions=False)])
+
+
+def test_far_deadline():
+    random.seed(1)
+    board = rand_stable_board()
+    strat = create_two_ply_strat(COLORS, AI_COLORS)
+    eq_(strat(game_state(board)),
+        strat(game_state(board), deadline=time.time() + 60))
+
+
+def test_expected_reply_ap():
+    random.seed(0)
+    board = rand_stable_board()
+    replies = ai_moves(board, AI_COLORS)
+    ok_(replies)
+    aps = [move_outcome(board, a, b).ap_in(AI_COLORS)
+           for a, b, _ in replies]
+    eq_(float(sum(aps)) / len(aps), expected_reply_ap(board, AI_COLORS))
+    # cached
+    eq_(float(sum(aps)) / len(aps), expected_reply_ap(board, AI_COLORS))
+
+
+def test_no_replies_into_holes():
+    # settled, waiting for a refill at the top of col 2: moving the Y up
+    # into the hole would match five, but can't happen in a game
+    board = parse_board(dedent("""\
+                               | Y  | Y  | E  | Y  | Y  |
+                               | R  | G  | Y  | P  | BL |
+                               | G  | R  | P  | BL | R  |
+                               | R  | G  | BL | P  | G  |
+                               | BK | P  | BL | G  | P  |
+                               """),
+                        create_board_parser(side=5))
+    replies = ai_moves(board, AI_COLORS)
+    eq_(8, len(replies))
+    ok_(all((0, 2) not in (a, b) for a, b, _ in replies))
+    aps = [move_outcome(board, a, b).ap_in(AI_COLORS)
+           for a, b, _ in replies]
+    eq_(float(sum(aps)) / len(aps), expected_reply_ap(board, AI_COLORS))
@@ -1,9 +1,12 @@
 import random
 
+from bitboard import find_runs
 from board import Board
 from constants import BOARD_SIDE
+from game import GameState
 from match import Match
-from tiles import EmptyTile, ColoredTile, CriticalTile, TeamupTile, \
+from stable_board import rand_stable_board
+from tiles import CRITICAL, EmptyTile, ColoredTile, CriticalTile, TeamupTile, \
     StrikeTile, AttackTile, ProtectTile, CountdownTile
 
 
@@ -62,6 +65,33 @@ def random_midgame_board_s():
     return str(random_midgame_board())
 
 
+def rand_stable_board_with_criticals(side):
+    """
+    A random stable board of side `side`, with some criticals sprinkled in
+    where they don't make a match.
+    """
+    board = rand_stable_board(side)
+    for _ in range(side):
+        row, col = random.randrange(side), random.randrange(side)
+        old = board.at(row, col)
+        board.set_at(row, col, CRITICAL)
+        if find_runs(board):
+            board.set_at(row, col, old)
+    return board
+
+
+def game_state(board):
+    """
+    A GameState for `board`, for strategies that look at nothing else.
+    """
+    return GameState(board=board,
+                     offense=None,
+                     defense=None,
+                     to_move=None,
+                     move_count=0,
+                     turn_count=1)
+
+
 def left_match(num_squares):
     def _left(row, col):
         return Match([(row, col - i) for i in range(num_squares)])
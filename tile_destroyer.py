@@ -8,7 +8,8 @@ Also does not let tiles fall--gravity.py handles that.
 
 from constants import MIN_DESTROY_ROW_OR_COL
 from match import find_matches
-from tiles import EmptyTile
+import numpy_backend
+from tiles import EMPTY
 
 
 def destroy_tiles(board):
@@ -31,44 +32,52 @@ def destroy_tiles(board):
       - a sorted list of the squares (as (row, col) tuples) that were replaced
         with empty tiles
     """
+    if numpy_backend.enabled():
+        result = numpy_backend.destroy_tiles(board)
+        if result is not None:
+            return result
+
     new_board = board.copy()
-    matches = find_matches(new_board)
+    destroyed = squares_to_destroy(find_matches(new_board), new_board.side)
+    for (row, col) in destroyed:
+        new_board.set_at(row, col, EMPTY)
+
+    return new_board, destroyed
+
 
+def squares_to_destroy(matches, side):
+    """
+    Return a sorted list of the squares `matches` destroy on a board of side
+    `side`: their own squares, and those of any rows / cols with 4+ matches.
+    """
     destroyed = set()
 
     for match in matches:
-        for (row, col) in match.squares:
-            new_board.set_at(row, col, EmptyTile())
-            destroyed.add((row, col))
+        destroyed.update(match.squares)
 
         extents = match.max_extents
 
-        for (row, col) in _destroy_rows(new_board, extents['rows']):
-            new_board.set_at(row, col, EmptyTile())
-            destroyed.add((row, col))
-
-        for (row, col) in _destroy_cols(new_board, extents['cols']):
-            new_board.set_at(row, col, EmptyTile())
-            destroyed.add((row, col))
+        destroyed.update(_destroy_rows(side, extents['rows']))
+        destroyed.update(_destroy_cols(side, extents['cols']))
 
-    return new_board, sorted(list(destroyed))
+    return sorted(destroyed)
 
 
-def _destroy_rows(board, row_extents):
+def _destroy_rows(side, row_extents):
         rows_to_destroy = (row
                            for (row, ext)
                            in row_extents.items()
                            if ext >= MIN_DESTROY_ROW_OR_COL)
         for row in rows_to_destroy:
-            for col in range(board.side):
+            for col in range(side):
                 yield (row, col)
 
 
-def _destroy_cols(board, col_extents):
+def _destroy_cols(side, col_extents):
         cols_to_destroy = (col
                            for (col, ext)
                            in col_extents.items()
                            if ext >= MIN_DESTROY_ROW_OR_COL)
         for col in cols_to_destroy:
-            for row in range(board.side):
+            for row in range(side):
                 yield (row, col)
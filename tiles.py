@@ -1,5 +1,9 @@
 """
 Code for dealing with tiles.
+
+Tiles compare and hash by value.  Plain tiles (colored, teamup, critical,
+empty, null) carry no state that changes, so rather than creating new ones,
+use the shared instances below (EMPTY, CRITICAL, colored_tile('Y'), etc.).
 """
 
 import random
@@ -13,6 +17,17 @@ class NullTile(object):
     match anything, but behaves like a normal tile under gravity.
     """
 
+    __slots__ = ()
+
+    def __eq__(self, other):
+        return type(other) is type(self)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(type(self))
+
     def __str__(self):
         return " "
 
@@ -49,6 +64,17 @@ class NullTile(object):
 
 class EmptyTile(object):
 
+    __slots__ = ()
+
+    def __eq__(self, other):
+        return type(other) is type(self)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(type(self))
+
     def __str__(self):
         return "E"
 
@@ -85,6 +111,17 @@ class EmptyTile(object):
 
 class GameTile(object):
 
+    __slots__ = ()
+
+    def __eq__(self, other):
+        return type(other) is type(self)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(type(self))
+
     def is_empty(self):
         return False
 
@@ -115,9 +152,17 @@ class GameTile(object):
 
 class ColoredTile(GameTile):
 
+    __slots__ = ('color',)
+
     def __init__(self, color=None):
         self.color = color
 
+    def __eq__(self, other):
+        return type(other) is type(self) and other.color == self.color
+
+    def __hash__(self):
+        return hash((type(self), self.color))
+
     def __str__(self):
         return self.color
 
@@ -150,6 +195,8 @@ def _color(s, color):
 
 class CriticalTile(GameTile):
 
+    __slots__ = ()
+
     def __str__(self):
         return "C"
 
@@ -162,6 +209,8 @@ class CriticalTile(GameTile):
 
 class TeamupTile(GameTile):
 
+    __slots__ = ()
+
     def __str__(self):
         return "T"
 
@@ -175,34 +224,49 @@ class TeamupTile(GameTile):
         return ('T', 1)
 
 
-class StrikeTile(ColoredTile):
+class _PoweredTile(ColoredTile):
+    """
+    A colored tile with a `strength` in a `direction` (strike, attack and
+    protect tiles), equal to tiles of the same type with the same color,
+    strength and direction.
+    """
+
+    __slots__ = ('strength', 'direction')
 
     def __init__(self, color=None, strength=None, direction=None):
-        super(StrikeTile, self).__init__(color=color)
+        super(_PoweredTile, self).__init__(color=color)
         self.strength = strength
         self.direction = direction
 
+    def __eq__(self, other):
+        return (type(other) is type(self) and
+                other.color == self.color and
+                other.strength == self.strength and
+                other.direction == self.direction)
+
+    def __hash__(self):
+        return hash((type(self), self.color, self.strength, self.direction))
+
+
+class StrikeTile(_PoweredTile):
+
+    __slots__ = ()
+
     def __str__(self):
         return "%s S %s %s" % (self.color, self.direction, self.strength)
 
 
-class AttackTile(ColoredTile):
+class AttackTile(_PoweredTile):
 
-    def __init__(self, color=None, strength=None, direction=None):
-        super(AttackTile, self).__init__(color=color)
-        self.strength = strength
-        self.direction = direction
+    __slots__ = ()
 
     def __str__(self):
         return "%s A %s %s" % (self.color, self.direction, self.strength)
 
 
-class ProtectTile(ColoredTile):
+class ProtectTile(_PoweredTile):
 
-    def __init__(self, color=None, strength=None, direction=None):
-        super(ProtectTile, self).__init__(color=color)
-        self.strength = strength
-        self.direction = direction
+    __slots__ = ()
 
     def __str__(self):
         return "%s P %s %s" % (self.color, self.direction, self.strength)
@@ -216,6 +280,8 @@ class ProtectTile(ColoredTile):
 
 class CountdownTile(ColoredTile):
 
+    __slots__ = ('turns_left', 'on_countdown')
+
     def __init__(self, color=None, turns_left=None, on_countdown=None):
         """
         - `on_countdown` is a callable that will be invoked (with no arguments)
@@ -225,6 +291,16 @@ class CountdownTile(ColoredTile):
         self.turns_left = turns_left
         self.on_countdown = on_countdown
 
+    def __eq__(self, other):
+        return (type(other) is type(self) and
+                other.color == self.color and
+                other.turns_left == self.turns_left and
+                other.on_countdown == self.on_countdown)
+
+    def __hash__(self):
+        # turns_left can change, so don't key dicts / sets on countdowns
+        return hash((type(self), self.color))
+
     def __str__(self):
         return "%s CD %s" % (self.color, self.turns_left)
 
@@ -234,22 +310,114 @@ class CountdownTile(ColoredTile):
                              on_countdown=self.on_countdown)
 
 
-NEW_TILES = [
-    lambda: ColoredTile('Y'),
-    lambda: ColoredTile('BL'),
-    lambda: ColoredTile('BK'),
-    lambda: ColoredTile('P'),
-    lambda: ColoredTile('R'),
-    lambda: ColoredTile('G'),
-    TeamupTile
-    ]
+COLORS = ['Y', 'BL', 'BK', 'P', 'R', 'G']
+
+# Shared plain tiles
+EMPTY = EmptyTile()
+NULL = NullTile()
+CRITICAL = CriticalTile()
+TEAMUP = TeamupTile()
+_COLORED = dict((color, ColoredTile(color)) for color in COLORS)
+
+
+def colored_tile(color):
+    """
+    Return the shared colored tile for `color`.
+    """
+    if color in _COLORED:
+        return _COLORED[color]
+    return ColoredTile(color)
+
+
+NEW_TILES = [colored_tile(color) for color in COLORS] + [TEAMUP]
 
 
 def new_rand_tile(no_teamups=False):
     """
-    Return a new random color or teamup tile (unless no_teamups is True).
+    Return a random (shared) color or teamup tile (unless no_teamups is
+    True).
     """
     while True:
-        tile = random.choice(NEW_TILES)()
+        tile = random.choice(NEW_TILES)
         if not tile.is_teamup() or not no_teamups:
             return tile
+
+
+# Compact codes, so a board can hold each tile in a single byte.
+#
+# The low COLOR_BITS bits hold the color (0 for uncolored tiles), the rest
+# hold the kind.  Plain tiles (colored, teamup, critical, empty, null) carry
+# no other state, so any tile with a given plain code is interchangeable with
+# any other.  Special tiles (strike, attack, protect, countdown) and anything
+# we don't recognize still need the tile object itself to be kept around.
+
+COLOR_BITS = 3
+COLOR_MASK = (1 << COLOR_BITS) - 1
+
+KIND_EMPTY = 0
+KIND_NULL = 1
+KIND_CRITICAL = 2
+KIND_TEAMUP = 3
+KIND_COLORED = 4
+KIND_STRIKE = 5
+KIND_ATTACK = 6
+KIND_PROTECT = 7
+KIND_COUNTDOWN = 8
+KIND_OTHER = 9
+
+_KIND_BY_TYPE = {
+    EmptyTile: KIND_EMPTY,
+    NullTile: KIND_NULL,
+    CriticalTile: KIND_CRITICAL,
+    TeamupTile: KIND_TEAMUP,
+    ColoredTile: KIND_COLORED,
+    StrikeTile: KIND_STRIKE,
+    AttackTile: KIND_ATTACK,
+    ProtectTile: KIND_PROTECT,
+    CountdownTile: KIND_COUNTDOWN,
+    }
+
+_COLOR_CODES = dict((color, i + 1) for i, color in enumerate(COLORS))
+
+OTHER_CODE = KIND_OTHER << COLOR_BITS
+
+
+def tile_code(tile):
+    """
+    Return the one byte code for `tile`.
+
+    Tiles of unknown types, or colored tiles of unknown colors, get
+    OTHER_CODE.
+    """
+    kind = _KIND_BY_TYPE.get(type(tile), KIND_OTHER)
+    if kind < KIND_COLORED:
+        return kind << COLOR_BITS
+    if kind == KIND_OTHER or tile.color not in _COLOR_CODES:
+        return OTHER_CODE
+    return (kind << COLOR_BITS) | _COLOR_CODES[tile.color]
+
+
+def code_kind(code):
+    return code >> COLOR_BITS
+
+
+def code_color(code):
+    """
+    Return the color letter for `code`, or None if it's uncolored.
+    """
+    color = code & COLOR_MASK
+    if color:
+        return COLORS[color - 1]
+    return None
+
+
+def _plain_tiles():
+    plain = [None] * 256
+    for tile in [EMPTY, NULL, CRITICAL, TEAMUP] + _COLORED.values():
+        plain[tile_code(tile)] = tile
+    return plain
+
+
+# Indexed by code: the shared tile for each plain code, None for codes that
+# need their tile object kept alongside.
+PLAIN_TILES = _plain_tiles()
@@ -0,0 +1,91 @@
+"""
+Two ply search, against the AI.
+
+The AI (see aimulator) picks its move at random from a short list it works
+out from the board, so for each of our moves we can tell what it's likely
+to do next, and how much AP that will earn it.  Each of our moves is scored
+as the AP it earns us, less the AP the AI is expected to earn in reply on
+the board it leaves (before anything is refilled, since that's unknown).
+
+Our moves are tried best first, and the search stops as soon as even a
+move earning the AI nothing couldn't beat the best score so far.  Settled
+moves come from the move_outcome transposition table, and the AI's expected
+reply on each board is cached too, so positions reached more than once
+(from either side of the board) are only worked out once.
+"""
+
+from anytime import anytime, until
+import board_aware_cache
+from aimulator import ai_moves
+from move_outcome import move_outcome
+from strategy import find_moves, _tiles_matched
+
+
+def create_two_ply_strat(colors, ai_colors):
+    """
+    Return a strategy that picks the move earning the most AP in `colors`,
+    less the AP in `ai_colors` the AI (with abilities in `ai_colors`) is
+    expected to earn in reply.
+
+    A move matching five earns another move rather than a reply, so is
+    scored on its own AP.
+
+    Ties are broken with reference to the lexically earliest swapped tiles.
+
+    Given a `deadline` (see anytime), our moves making the most tiles of
+    matches are worked out first, and the best of the moves looked at by
+    then is picked.
+    """
+    colors = set(colors)
+    ai_colors = frozenset(ai_colors)
+
+    @anytime
+    def _two_ply_strat(game_state, deadline=None):
+        board = game_state.board
+        moves_with_matches = find_moves(board, both_directions=False)
+        if deadline is not None:
+            moves_with_matches = sorted(moves_with_matches,
+                                        key=_tiles_matched, reverse=True)
+        scored = []
+        for mwm in until(deadline, moves_with_matches):
+            outcome = move_outcome(board, mwm.from_sq, mwm.to_sq,
+                                   mwm.matches)
+            scored.append((outcome.ap_in(colors),
+                           (mwm.from_sq, mwm.to_sq),
+                           outcome))
+        scored.sort(key=lambda s: (-s[0], s[1]))
+
+        best_score = best_move = None
+        for ap, move, outcome in until(deadline, scored):
+            # the AI earns nothing at best, so no later move can beat this
+            if best_score is not None and ap < best_score:
+                break
+            score = ap
+            if not outcome.matched_five:
+                score -= expected_reply_ap(outcome.board, ai_colors)
+            if (best_score is None or score > best_score or
+                    (score == best_score and move < best_move)):
+                best_score, best_move = score, move
+        return best_move
+
+    return _two_ply_strat
+
+
+def expected_reply_ap(board, ai_colors):
+    """
+    Return the AP in `ai_colors` the AI, with abilities in `ai_colors`, is
+    expected to earn with its next move on `board`.
+    """
+    ai_colors = frozenset(ai_colors)
+    cached = board_aware_cache.get('expected_reply_ap', board, ai_colors)
+    if cached is not None:
+        return cached
+
+    replies = ai_moves(board, ai_colors)
+    total = 0
+    for from_sq, to_sq, _ in replies:
+        total += move_outcome(board, from_sq, to_sq).ap_in(ai_colors)
+    expected = float(total) / len(replies) if replies else 0.0
+
+    board_aware_cache.set('expected_reply_ap', board, ai_colors, expected)
+    return expected